@@ -70,6 +70,10 @@ var reader = {
   // eg, 'world/2010/jul/08/gay/clergyman-jeffrey-john-bishop' => 3
   issueArticleIds: {},
 
+  // If the Contents File lists packs of articles, this will map each pack's
+  // 0-based index to the jQuery ajax request that loads it.
+  packRequests: {},
+
   // Will be the 1-based index of the currently-viewed file in reader.issueArticles.
   // Begins on 0 until we view a page.
   currentPos: 0,
@@ -104,6 +108,17 @@ var reader = {
   // Keep track of nav that's in the process glowing on/off.
   navGlowing: {'next':false, 'prev':false},
 
+  // Will be data from the issue's search.json, if there is one, once it's loaded.
+  // Its 'terms' maps each stemmed word to the 0-based positions of the articles
+  // it's in, each position stored as the difference from the one before it.
+  searchIndex: null,
+
+  // Words that aren't in the search index. The same as SEARCH_STOP_WORDS in
+  // scraper.py, so keep the two in step.
+  searchStopWords: ('a an and are as at be but by for from has have he her his i in is it its '
+                    + 'not of on or our she that the their they this to was we were which who '
+                    + 'will with you').split(' '),
+
   initialize: function(options) {
     if (! options) {
       options = {};
@@ -426,6 +441,8 @@ var reader = {
 
     $(document).bind('keydown', 'v', function(){ reader.openOriginal(); });
 
+    $(document).bind('keydown', '/', function(){ reader.searchPrompt(); return false; });
+
     $(document).bind('keydown', 'space', function(){
       // Use default space action, unless we're at end of page.
       if (reader.whereAmI().is_at_last) {
@@ -484,6 +501,8 @@ var reader = {
 
   /**
    * Load the HTML from the article file for this article.
+   * Or, if the article is in a pack of articles, from the pack file, which is
+   * only requested once for all the articles in it.
    * idx is the numerical, 1-based index of the filename from reader.issueArticles.
    * position is either 'onscreen' (this is the article we're about to view) or
    * 'offscreen' (for cached articles).
@@ -491,21 +510,22 @@ var reader = {
   loadArticleFile: function(idx, position) {
     if ( $('#page-'+idx).exists() && ! $('#page-'+idx).hasClass('loaded') ) {
       // Only load the contents if the #page-idx exists and has no contents.
+      var article = reader.issueArticles[idx-1];
+
+      if ('pack' in article) {
+        reader.loadPack(article['pack'][0]).done(function(fragments) {
+          reader.showArticle(idx, fragments[article['file']], position);
+        });
+        return;
+      }
+
       $.ajax({
-        url: 'archive/' + reader.issueDate + '/' + reader.issueArticles[idx-1]['file'],
+        url: 'archive/' + reader.issueDate + '/' + article['file'],
         dataType: 'html',
         data: {},
         async: true,
         success: function(returnedData) {
-          $('#page-'+idx).html(returnedData).addClass('loaded');
-          // Highlight the whole of the shortURL <input> when selected.
-          $('#page-'+idx+' input').focus(function() {
-            $(this).select();
-          }).mouseup(function(e){
-            e.preventDefault();
-          });
-          // Make the newly-loaded article the correct size.
-          reader.resizeArticle($('#page-'+idx), position);
+          reader.showArticle(idx, returnedData, position);
         },
         error: function(XMLHttpRequest, textStatus, errorThrown) {
           reader.error("Can't load article file: "+textStatus + ', '+errorThrown);
@@ -515,6 +535,58 @@ var reader = {
   },
 
 
+  /**
+   * Load a pack of articles, if it hasn't already been requested.
+   * packIdx is the 0-based index of the pack in the Contents File's meta.packs.
+   * Returns a jQuery promise that's resolved with an object mapping each
+   * article's file name to its HTML.
+   */
+  loadPack: function(packIdx) {
+    if ( ! (packIdx in reader.packRequests)) {
+      reader.packRequests[packIdx] = $.ajax({
+        url: 'archive/' + reader.issueDate + '/' + reader.issueContents.meta.packs[packIdx],
+        dataType: 'text',
+        data: {},
+        async: true
+      }).then(function(returnedData) {
+        // Each article's HTML is preceded by a comment like <!--pack:abc.html-->
+        var parts = returnedData.split(/<!--pack:([^>]+?)-->/);
+        var fragments = {};
+        for (var n = 1; n < parts.length; n += 2) {
+          fragments[parts[n]] = parts[n+1];
+        }
+        return fragments;
+      }, function(XMLHttpRequest, textStatus, errorThrown) {
+        // Let the next attempt request it again.
+        delete reader.packRequests[packIdx];
+        reader.error("Can't load article pack: "+textStatus + ', '+errorThrown);
+      });
+    }
+    return reader.packRequests[packIdx];
+  },
+
+
+  /**
+   * Put an article's HTML into its page.
+   * idx is the numerical, 1-based index of the article in reader.issueArticles.
+   * position is either 'onscreen' or 'offscreen', as for loadArticleFile().
+   */
+  showArticle: function(idx, html, position) {
+    if ($('#page-'+idx).hasClass('loaded')) {
+      return;
+    }
+    $('#page-'+idx).html(html).addClass('loaded');
+    // Highlight the whole of the shortURL <input> when selected.
+    $('#page-'+idx+' input').focus(function() {
+      $(this).select();
+    }).mouseup(function(e){
+      e.preventDefault();
+    });
+    // Make the newly-loaded article the correct size.
+    reader.resizeArticle($('#page-'+idx), position);
+  },
+
+
   /**
    * Load the prev/next article(s) off-screen.
    * Used when we move to a new article (including the first one).
@@ -937,7 +1009,10 @@ var reader = {
         // reader.issueArticles.
         reader.issueArticleIds[article.id] = reader.issueArticles.length;
 
-        var lengthPercent = Math.round((article.fields.wordcount / reader.issueContents.meta.max_words) * 100);
+        // The compact contents file has 'words'; the full one has the API's fields.
+        var words = ('words' in article) ? article.words : article.fields.wordcount;
+
+        var lengthPercent = Math.round((words / reader.issueContents.meta.max_words) * 100);
 
         // Work out the height of this <li>, in proportion to its length.
         var maxHeight = reader.hasTouch ? 15 : 12;
@@ -1184,6 +1259,133 @@ var reader = {
   },
 
 
+  /**
+   * Load the issue's search.json into reader.searchIndex, then call callback.
+   * If there's no search index for the issue, reader.searchIndex stays null.
+   */
+  loadSearchIndex: function(callback) {
+    if (reader.searchIndex) {
+      callback();
+      return;
+    }
+    $.ajax({
+      url: 'archive/' + reader.issueDate + '/search.json',
+      dataType: 'json',
+      success: function(returnedData) {
+        reader.searchIndex = returnedData;
+      },
+      complete: function() {
+        callback();
+      }
+    });
+  },
+
+
+  /**
+   * Returns a list of the 1-based indexes, in reader.issueArticles, of the
+   * articles that contain all the words in query.
+   * reader.searchIndex must have been loaded.
+   */
+  search: function(query) {
+    var matches = null;
+
+    $.each(reader.searchTerms(query), function(n, term) {
+      var positions = {};
+      var position = 0;
+      $.each(reader.searchIndex.terms[term] || [], function(m, gap) {
+        position += gap;
+        if (matches === null || matches[position]) {
+          positions[position] = true;
+        }
+      });
+      matches = positions;
+    });
+
+    var indexes = [];
+    $.each(matches || {}, function(position) {
+      indexes.push(parseInt(position, 10) + 1);
+    });
+    return indexes.sort(function(a, b) { return a - b; });
+  },
+
+
+  /**
+   * Ask for some words to search for, and move to the next article after the
+   * current one that contains them all, going back to the start if need be.
+   */
+  searchPrompt: function() {
+    var query = window.prompt('Search this issue for:');
+    if (! query) {
+      return;
+    }
+    reader.loadSearchIndex(function() {
+      if (! reader.searchIndex) {
+        reader.error("Can't load the search index for this issue.");
+        return;
+      }
+      var indexes = reader.search(query);
+      if (indexes.length === 0) {
+        window.alert('No articles found.');
+        return;
+      }
+      var idx = indexes[0];
+      $.each(indexes, function(n, i) {
+        if (i > reader.currentPos) {
+          idx = i;
+          return false;
+        }
+      });
+      reader.moveToArticle(idx);
+    });
+  },
+
+
+  /**
+   * Splits query into the same stemmed terms that search.json uses.
+   * Does the same as tokenize() and search_terms() in scraper.py.
+   */
+  searchTerms: function(query) {
+    var text = query.toLowerCase();
+    if (text.normalize) {
+      text = text.normalize('NFKD').replace(/[\u0300-\u036f]/g, '');
+    }
+    var terms = [];
+    $.each(text.match(/[a-z0-9]+/g) || [], function(n, word) {
+      if (word.length > 1 && $.inArray(word, reader.searchStopWords) == -1) {
+        terms.push(reader.stem(word));
+      }
+    });
+    return terms;
+  },
+
+
+  /**
+   * Returns a simple stem of a lowercase word. The same as stem() in
+   * scraper.py, so keep the two in step.
+   */
+  stem: function(word) {
+    var endsWith = function(suffix) {
+      return word.slice(-suffix.length) == suffix;
+    };
+
+    if (word.length > 4 && endsWith('ies')) {
+      word = word.slice(0, -3) + 'y';
+    } else if (endsWith('sses')) {
+      word = word.slice(0, -2);
+    } else if (word.length > 3 && endsWith('s') && ! endsWith('ss') && ! endsWith('us')) {
+      word = word.slice(0, -1);
+    }
+
+    var suffixes = ['ing', 'ed', 'ly'];
+    for (var i = 0; i < suffixes.length; i++) {
+      if (word.length > suffixes[i].length + 3 && endsWith(suffixes[i])) {
+        return word.slice(0, -suffixes[i].length);
+      }
+    }
+    return word;
+  },
+
+
   /**
    * Show the 'About' page.
    */
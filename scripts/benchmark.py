@@ -0,0 +1,616 @@
+#!/usr/bin/env python
+"""
+Times each stage of the scraper against recorded pages of API results, so we
+can see whether changes make it faster or slower without using the live API.
+
+Recorded editions are kept in benchmark_fixtures/, one directory per edition:
+
+    benchmark_fixtures/saturday/
+        edition.json      {"date": "2023-02-25"}
+        page-1.json.gz    The API's response for each page of the edition.
+        page-2.json.gz
+        ...
+
+To record today's edition from the live API, using the settings in scraper.cfg:
+
+    $ ./benchmark.py record weekday
+
+Or, to make a made-up edition of 400 articles without using the API at all:
+
+    $ ./benchmark.py synthetic big --articles 400 --date 2023-02-25
+
+Then to time running the scraper on some or all of the recorded editions:
+
+    $ ./benchmark.py run
+    $ ./benchmark.py run saturday --repeat 5 --output results.json
+
+The recorded pages are served to the scraper from a local HTTP server. Each
+edition is scraped into an empty directory (a 'cold' run) and then scraped again
+into the same directory (a 'warm' run, as when the scraper is re-run hourly).
+The results are printed, or saved with --output, as JSON.
+
+The same server stands in for the Guardian's image servers: every thumbnail and
+contributor image URL in the pages is changed to point at it, and it answers
+them all with the same made-up image. So, for example, mirroring images can be
+timed with:
+
+    $ ./benchmark.py run --set mirror_images=1
+
+To time how long the scraper takes to start up, each time in a new Python
+process, before it fetches anything:
+
+    $ ./benchmark.py startup --repeat 10
+
+That times importing scraper.py, setting up a GuardianGrabber, importing Jinja
+and typogrify, and loading the article template. The first, 'cold', run has to
+compile the template; the 'warm' runs load it already compiled. Loading the
+template from its source, as every run once did, is timed too.
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scraper import GuardianGrabber, ScraperError
+
+FIXTURES_DIR = os.path.join(sys.path[0], "benchmark_fixtures")
+
+# The names of the stages we time, and the GuardianGrabber methods they time.
+# 'render' is also timed, as the time spent in save_articles_html() that wasn't
+# spent in write_file().
+STAGES = {
+    "fetch": "request",
+    "decode": "decode_json",
+    "classify": "get_tone",
+    "write": "write_file",
+    "sort": "sort_articles",
+    "images": "mirror_article_images",
+}
+
+
+def load_fixture(name):
+    """
+    Returns the date (a datetime) and the list of pages (each the bytes of the
+    API's JSON response) recorded for the edition called name.
+    """
+    fixture_dir = os.path.join(FIXTURES_DIR, name)
+
+    with open(os.path.join(fixture_dir, "edition.json")) as fp:
+        edition = json.load(fp)
+
+    pages = []
+    while True:
+        path = os.path.join(fixture_dir, "page-%s.json.gz" % (len(pages) + 1))
+        if not os.path.exists(path):
+            break
+        with gzip.open(path) as fp:
+            pages.append(fp.read())
+
+    return datetime.datetime.strptime(edition["date"], "%Y-%m-%d"), pages
+
+
+def save_fixture(name, date, pages):
+    "Saves the date (a datetime) and list of pages as the edition called name."
+    fixture_dir = os.path.join(FIXTURES_DIR, name)
+    os.makedirs(fixture_dir, exist_ok=True)
+
+    with open(os.path.join(fixture_dir, "edition.json"), "w") as fp:
+        json.dump({"date": date.strftime("%Y-%m-%d")}, fp)
+
+    for n, page in enumerate(pages, 1):
+        with gzip.open(os.path.join(fixture_dir, "page-%s.json.gz" % n), "wb") as fp:
+            fp.write(page)
+
+    print("Saved %s pages in %s" % (len(pages), fixture_dir))
+
+
+def fixture_names():
+    "Returns a list of the names of all the recorded editions."
+    if not os.path.isdir(FIXTURES_DIR):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(FIXTURES_DIR)
+        if os.path.exists(os.path.join(FIXTURES_DIR, name, "edition.json"))
+    )
+
+
+def placeholder_png(width, height):
+    "Returns the bytes of a PNG image, width by height pixels, of a gradient."
+
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    pixels = b"".join(
+        b"\x00"
+        + b"".join(
+            bytes((x * 255 // width, y * 255 // height, 128)) for x in range(width)
+        )
+        for y in range(height)
+    )
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(pixels))
+        + chunk(b"IEND", b"")
+    )
+
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    """
+    Serves the recorded pages in self.server.pages as if it was the Content
+    API's /search endpoint, and self.server.image for any path in /media/.
+    """
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        if self.path.startswith("/media/"):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(self.server.image)))
+            self.end_headers()
+            if not head:
+                self.wfile.write(self.server.image)
+            return
+
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+        page = int(query.get("page", 1))
+
+        if 1 <= page <= len(self.server.pages):
+            body = self.server.pages[page - 1]
+            self.send_response(200)
+        else:
+            body = b'{"response": {"status": "error"}}'
+            self.send_response(400)
+
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_api(pages):
+    """
+    Starts an HTTP server, in a background thread, serving the list of pages,
+    and a placeholder image for the images they use.
+    Returns the server and the URL to use as the API's search endpoint.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPIHandler)
+    base_url = "http://127.0.0.1:%s" % server.server_address[1]
+    server.pages = [local_image_urls(page, base_url + "/media/") for page in pages]
+    server.image = placeholder_png(500, 300)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, base_url + "/search"
+
+
+def local_image_urls(page, media_url):
+    """
+    Returns a page of API results, as bytes, with the URL of every thumbnail and
+    contributor image in it changed to be within media_url, so the scraper never
+    fetches images from the internet.
+    """
+
+    def local_url(url):
+        return media_url + url.split("://", 1)[-1]
+
+    data = json.loads(page)
+    for article in data["response"].get("results", []):
+        fields = article.get("fields", {})
+        if "thumbnail" in fields:
+            fields["thumbnail"] = local_url(fields["thumbnail"])
+        for tag in article.get("tags", []):
+            if "bylineImageUrl" in tag:
+                tag["bylineImageUrl"] = local_url(tag["bylineImageUrl"])
+    return json.dumps(data).encode("utf-8")
+
+
+def make_config(work_dir, api_url, settings):
+    """
+    Writes a temporary config file that saves everything, including lockfiles,
+    raw API data, the render cache, profiles and compiled templates, within
+    work_dir, and fetches from api_url. Any settings in the dict settings are used
+    instead of those.
+    Returns its path.
+    """
+    config = {
+        "guardian_api_key": "benchmark",
+        "api_url": api_url,
+        "archive_dir": os.path.join(work_dir, "archive/"),
+        "lock_dir": work_dir,
+        "raw_dir": os.path.join(work_dir, "raw/"),
+        "render_cache_file": os.path.join(work_dir, "render_cache.db"),
+        "profile_dir": os.path.join(work_dir, "profiles/"),
+        "compiled_templates_dir": os.path.join(work_dir, "compiled_templates/"),
+        "verbose": 0,
+        "fetch_interval": 0,
+    }
+    config.update(settings)
+    lines = ["[Settings]"] + ["%s = %s" % item for item in config.items()]
+
+    fd, path = tempfile.mkstemp(suffix=".cfg")
+    with os.fdopen(fd, "w") as fp:
+        fp.write("\n".join(lines) + "\n")
+    return path
+
+
+# Run in a new Python process by time_startup(), with the path of a config file
+# as its argument. Prints a JSON dict of the seconds each step took.
+STARTUP_SCRIPT = """
+import json, sys, time
+
+started = time.perf_counter()
+import scraper
+
+imported = time.perf_counter()
+grabber = scraper.GuardianGrabber(config_file=sys.argv[1])
+initialized = time.perf_counter()
+import jinja2, typogrify.templatetags.jinja_filters
+
+imported_jinja = time.perf_counter()
+grabber.template
+loaded = time.perf_counter()
+scraper.make_jinja_env().get_template("article.html")
+from_source = time.perf_counter()
+
+print(json.dumps({
+    "import": imported - started,
+    "init": initialized - imported,
+    "import_jinja": imported_jinja - initialized,
+    "template": loaded - imported_jinja,
+    "template_source": from_source - loaded,
+    "total": loaded - started,
+}))
+"""
+
+
+def time_startup(repeat):
+    """
+    Times starting up the scraper in a new process, repeat times, with a newly
+    emptied compiled_templates_dir. Returns a dict of the results.
+    """
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+    work_dir = tempfile.mkdtemp()
+    config_path = make_config(work_dir, "http://127.0.0.1:1/search", {})
+    runs = []
+
+    try:
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, "-c", STARTUP_SCRIPT, config_path],
+                cwd=sys.path[0],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            runs.append(
+                {
+                    step: round(seconds, 4)
+                    for step, seconds in json.loads(output).items()
+                }
+            )
+    finally:
+        os.remove(config_path)
+        shutil.rmtree(work_dir)
+
+    results["cold"] = runs[0]
+    if len(runs) > 1:
+        results["warm"] = {
+            "median": {
+                step: round(statistics.median(run[step] for run in runs[1:]), 4)
+                for step in runs[1]
+            },
+            "runs": runs[1:],
+        }
+
+    return results
+
+
+def time_method(grabber, method_name, timings, stage):
+    """
+    Replaces the grabber's method_name method with one that adds the seconds
+    spent in it to timings[stage].
+    """
+    method = getattr(grabber, method_name)
+
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timings[stage] += time.perf_counter() - started
+
+    setattr(grabber, method_name, timed)
+
+
+def time_run(config_path, issue_date):
+    """
+    Runs the scraper once with the config at config_path.
+    Returns a dict of the seconds spent in each stage, and in total.
+    """
+    grabber = GuardianGrabber(config_file=config_path)
+
+    timings = dict.fromkeys(list(STAGES) + ["render"], 0.0)
+    for stage, method_name in STAGES.items():
+        time_method(grabber, method_name, timings, stage)
+
+    save_articles_html = grabber.save_articles_html
+
+    def timed_save_articles_html(articles):
+        started = time.perf_counter()
+        write_time = timings["write"]
+        try:
+            return save_articles_html(articles)
+        finally:
+            timings["render"] += (time.perf_counter() - started) - (
+                timings["write"] - write_time
+            )
+
+    grabber.save_articles_html = timed_save_articles_html
+
+    started = time.perf_counter()
+    try:
+        grabber.start(issue_date=issue_date)
+    finally:
+        grabber.close()
+    timings["total"] = time.perf_counter() - started
+
+    # The fetch stage is summed across threads, so may be more than the total.
+    return {stage: round(seconds, 4) for stage, seconds in timings.items()}
+
+
+def run_benchmarks(names, repeat, settings):
+    """
+    Times cold and warm runs of the scraper for each named edition, repeat times.
+    Returns a dict of the results.
+    """
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "editions": {},
+    }
+
+    for name in names:
+        issue_date, pages = load_fixture(name)
+        server, api_url = start_stub_api(pages)
+        runs = {"cold": [], "warm": []}
+
+        try:
+            for _ in range(repeat):
+                work_dir = tempfile.mkdtemp()
+                config_path = make_config(work_dir, api_url, settings)
+                try:
+                    for kind in ("cold", "warm"):
+                        runs[kind].append(time_run(config_path, issue_date))
+                finally:
+                    os.remove(config_path)
+                    shutil.rmtree(work_dir)
+        finally:
+            server.shutdown()
+
+        results["editions"][name] = {
+            "date": issue_date.strftime("%Y-%m-%d"),
+            "pages": len(pages),
+        }
+        for kind, kind_runs in runs.items():
+            results["editions"][name][kind] = {
+                "median": {
+                    stage: round(statistics.median(run[stage] for run in kind_runs), 4)
+                    for stage in kind_runs[0]
+                },
+                "runs": kind_runs,
+            }
+
+    return results
+
+
+def record(name, config_path):
+    """
+    Fetches every page of today's edition from the live API, using the settings
+    in the config file at config_path, and saves them as the edition name.
+    """
+    grabber = GuardianGrabber(config_file=config_path)
+    grabber.set_issue_date()
+
+    pages = []
+    total_pages = 1
+    while len(pages) < total_pages:
+        response = grabber.request(
+            grabber.api_url,
+            params=grabber.api_args(page=len(pages) + 1, page_size=grabber.page_size),
+            api=True,
+        )
+        response.raise_for_status()
+        total_pages = grabber.decode_json(response.content)["response"].get("pages", 1)
+        pages.append(response.content)
+
+    save_fixture(name, grabber.issue_date, pages)
+
+
+def make_synthetic(name, articles, date):
+    """
+    Saves a made-up edition of articles articles, for the date (a datetime), as
+    the edition name. The articles' bodies are random lorem ipsum, with the
+    occasional interactive and grid thrown in.
+    """
+    rnd = random.Random(name)
+    words = (
+        "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+        'tempor incididunt ut labore et dolore magna aliqua it\'s "quoted" -- '
+    ).split(" ")
+    books = [
+        "theguardian/mainsection",
+        "theguardian/journal",
+        "theguardian/g2",
+        "theguardian/sport",
+    ]
+    tones = ["news", "comment", "letters", "obituaries", "features", "reviews"]
+
+    results = []
+    for n in range(articles):
+        paragraphs = [
+            "<p>%s</p>" % " ".join(rnd.choice(words) for _ in range(60))
+            for _ in range(rnd.randint(2, 60))
+        ]
+        if n % 10 == 0:
+            paragraphs.append(
+                '<figure class="element element-atom">'
+                '<gu-atom data-atom-type="interactive"></gu-atom></figure>'
+            )
+        if n % 25 == 0:
+            paragraphs.append('<figure><img src="grid.png" alt="Grid"></figure>')
+        book = books[n % len(books)]
+        article_id = "news/%s/synthetic-article-%s" % (date.strftime("%Y/%b/%d"), n)
+        results.append(
+            {
+                "id": article_id,
+                "type": "article",
+                "sectionName": "News",
+                "webTitle": "Synthetic article %s" % n,
+                "webUrl": "https://www.theguardian.com/" + article_id,
+                "fields": {
+                    "headline": "Synthetic article %s" % n,
+                    "standfirst": "<p>%s</p>" % " ".join(words[:20]),
+                    "byline": "A Reporter",
+                    "body": "".join(paragraphs),
+                    "newspaperPageNumber": str(1 + n // 4),
+                    "publication": "The Guardian",
+                    "shortUrl": "https://gu.com/p/%s" % n,
+                    "thumbnail": "https://media.example.com/%s.jpg" % n,
+                    "wordcount": str(60 * len(paragraphs)),
+                    "lastModified": date.strftime("%Y-%m-%dT00:00:00Z"),
+                },
+                "elements": [],
+                "tags": [
+                    {"id": book, "type": "newspaper-book", "webTitle": book},
+                    {"id": "tone/" + tones[n % len(tones)], "type": "tone"},
+                ],
+            }
+        )
+
+    page_size = 200
+    pages = []
+    total_pages = max(1, -(-len(results) // page_size))
+    for n in range(total_pages):
+        first = n * page_size
+        last = first + page_size
+        response = {
+            "status": "ok",
+            "total": len(results),
+            "currentPage": n + 1,
+            "pages": total_pages,
+            "results": results[first:last],
+        }
+        pages.append(json.dumps({"response": response}).encode("utf-8"))
+
+    save_fixture(name, date, pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Time the recorded editions.")
+    run_parser.add_argument(
+        "names", nargs="*", help="Editions to run (default: all of them)"
+    )
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--output", help="Save the results to this file.")
+    run_parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="SETTING=VALUE",
+        help="A scraper.cfg setting to use, eg render_workers=4",
+    )
+
+    record_parser = subparsers.add_parser(
+        "record", help="Record today's edition from the live API."
+    )
+    record_parser.add_argument("name")
+    record_parser.add_argument(
+        "--config", default=os.path.join(sys.path[0], "scraper.cfg")
+    )
+
+    synthetic_parser = subparsers.add_parser(
+        "synthetic", help="Make up an edition of random articles."
+    )
+    synthetic_parser.add_argument("name")
+    synthetic_parser.add_argument("--articles", type=int, default=300)
+    synthetic_parser.add_argument(
+        "--date", default=datetime.date.today().strftime("%Y-%m-%d")
+    )
+
+    startup_parser = subparsers.add_parser(
+        "startup", help="Time importing and setting up the scraper."
+    )
+    startup_parser.add_argument("--repeat", type=int, default=10)
+    startup_parser.add_argument("--output", help="Save the results to this file.")
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.name, args.config)
+
+    elif args.command == "startup":
+        results = json.dumps(time_startup(args.repeat), indent=2)
+        if args.output:
+            with open(args.output, "w") as fp:
+                fp.write(results + "\n")
+        else:
+            print(results)
+
+    elif args.command == "synthetic":
+        make_synthetic(
+            args.name, args.articles, datetime.datetime.strptime(args.date, "%Y-%m-%d")
+        )
+
+    else:
+        names = args.names or fixture_names()
+        if not names:
+            raise ScraperError(
+                "There are no recorded editions in %s. Use the 'record' or "
+                "'synthetic' commands to make some." % FIXTURES_DIR
+            )
+        settings = dict(setting.split("=", 1) for setting in args.set)
+        results = json.dumps(run_benchmarks(names, args.repeat, settings), indent=2)
+        if args.output:
+            with open(args.output, "w") as fp:
+                fp.write(results + "\n")
+        else:
+            print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,607 @@
 #!/usr/bin/env python
-from bs4 import BeautifulSoup
+import argparse
 import re
+import codecs
+import collections
+import copy
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import configparser
+import contextlib
+import cProfile
 import datetime
-import dateutil.parser
+import email.utils
+import filecmp
+import functools
+import gzip
 import hashlib
-from jinja2 import Environment, PackageLoader
+import heapq
+from html import unescape
+import importlib.util
+import io
+import itertools
 import json
+import mimetypes
 import os
-import pytz
-import requests
+import random
 import shutil
 import signal
+import sqlite3
 import sys
+import tempfile
+import threading
 import time
-from typogrify.templatetags import jinja_filters
+import unicodedata
+import urllib.parse
 import warnings
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    # Optional. Only used to save .br versions of files if precompress is on.
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    # Optional. Makes encoding and decoding JSON quicker.
+    orjson = None
+
+# asyncio, BeautifulSoup, dateutil, Jinja, pytz, requests and typogrify take
+# longer to import than everything else put together, so they're imported by
+# the functions that use them. Runs that stop early, eg because another run is
+# still going, or that have nothing to render, then don't wait for them.
+
+
+# How many days' issues are kept in the archive, including today's. Older ones
+# are deleted whenever an issue is built.
+KEEP_DAYS = 2
+
+# Increase this whenever a change to the scraper's filters or processing would
+# change the HTML rendered for an article. Along with the template itself, it
+# decides whether articles saved by a previous run need rendering again.
+RENDER_VERSION = 2
+
+# Where the article template's source is.
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../templates")
+
+# Bits of HTML that transform_body() might need to change. If an article's body
+# contains none of them it doesn't need parsing at all.
+BODY_MARKERS = ("<gu-atom", "element-interactive", 'alt="Grid"')
+
+# How many bytes of an API response to read at a time if stream_decode is on.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# How many articles at a time to process while the rest of a page of them is
+# arriving, if stream_decode is on.
+STREAM_BATCH_SIZE = 25
+
+# Matches the start of the list of articles in an API response.
+RESULTS_START = re.compile(r'"results"\s*:\s*\[')
+
+# Matches what can come between the items in a JSON list.
+ITEM_SEPARATOR = re.compile(r"[\s,]*")
+
+# Words too common to be worth putting in the search index.
+# reader.js has the same list, so keep the two in step.
+SEARCH_STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its "
+    "not of on or our she that the their they this to was we were which who "
+    "will with you".split()
+)
+
+
+def transform_body(html, article_url):
+    """Jinja filter that tidies up an article's body HTML in a single pass:
+
+    * Removes empty <p></p> tags.
+    * Replaces the <gu-atom> "interactive" elements, and interactive iframes,
+      with links to the article or interactive. Because we can't do anything
+      useful with them and they just show as 'default' or 'interactive'
+      otherwise.
+    * Removes any <img alt="Grid"> elements. Used for the background of an
+      interactive image thing on the website, but displays as a full-width
+      empty grid on our site.
+
+    The HTML is only parsed if it contains one of the BODY_MARKERS.
+    """
+    html = html.replace("<p></p>", "")
+
+    if not any(marker in html for marker in BODY_MARKERS):
+        return html
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    def replace_element_with_link(element, url, text):
+        """
+        Replace a soup element with a paragraph and a link to a URL.
+
+        element - The element to replace
+        url - The URL to link to
+        text - The text for the link
+        """
+        p = soup.new_tag("p", **{"class": "dp-interactive"})
+        a = soup.new_tag("a", href=url, target="_new")
+        a.string = text
+        p.append(a)
+        element.replace_with(p)
+
+    # Replace:
+    #   <figure ...>
+    #     <gu-atom data-atom-type="interactive" ...>...</gu-atom>
+    #   </figure>
+    # There's no iframe, no interactive to link specifically to.
+    for gu_atom in soup.find_all("gu-atom", {"data-atom-type": "interactive"}):
+        figure = gu_atom.find_parent("figure") or gu_atom
+        instruction = "To view ‘interactive’ open article in new window"
+        replace_element_with_link(figure, article_url, instruction)
+
+    # Replace:
+    #   <figure data-canonical-url="[interactive url]" ...>
+    #     <iframe ...>...</iframe>
+    #   </figure>
+    # We can link directly to the interactive on its own page
+    for figure in soup.find_all("figure", {"class": "element-interactive"}):
+        if "data-canonical-url" in figure.attrs:
+            interactive_url = figure.attrs["data-canonical-url"]
+            instruction = "Open ‘interactive’ in new window"
+            replace_element_with_link(figure, interactive_url, instruction)
+
+    # Remove the figures containing any grids.
+    for grid in soup.find_all("img", {"alt": "Grid"}):
+        figure = grid.find_parent("figure") or grid
+        figure.decompose()
+
+    return str(soup)
+
+
+def temp_file_path(path):
+    """
+    Returns the path of a temporary file to write before renaming it to path,
+    unique to this process and thread so that they don't overwrite each
+    other's.
+    """
+    return "%s.%s.%s.tmp" % (path, os.getpid(), threading.get_ident())
+
+
+def replace_file(path, data):
+    """
+    Saves the bytes data at path by writing a temporary file and renaming it.
+    So anyone reading the file sees either the old or the new version, never
+    a half-written one. And if path was a hard link, the other links to it are
+    left unchanged.
+    """
+    temp_path = temp_file_path(path)
+    try:
+        with open(temp_path, "wb") as fp:
+            fp.write(data)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def remove_compressed_files(path, extensions=(".gz", ".br")):
+    """
+    Deletes any compressed copies of the file at path, like path + '.gz', so
+    that a web server doesn't send them instead of a newer version of it.
+    """
+    for extension in extensions:
+        try:
+            os.remove(path + extension)
+        except FileNotFoundError:
+            pass
+
+
+def link_or_copy(source, destination):
+    """
+    Hard links the file at source to destination, or copies it if that's not
+    possible (eg, they're on different filesystems).
+    """
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def json_dumps(data):
+    """
+    Returns data as a string of compact JSON, with any non-ASCII characters
+    left as they are rather than escaped. Uses orjson if it's installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def json_loads(data):
+    "Returns the data from a string or bytes of JSON. Uses orjson if it's installed."
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_results(chunks):
+    """
+    Decodes the JSON of an API response from an iterable of pieces of its
+    bytes, as they arrive.
+
+    First yields the response's data, with an empty 'results' list, as soon as
+    everything before the results has arrived. Then yields each of the results
+    in turn, as soon as all of it has arrived. If there's no 'results' list
+    the whole data is yielded once it's all arrived.
+
+    Raises ValueError if the JSON isn't valid.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    text = ""
+
+    def read_more():
+        "Adds the next piece to text. Returns False if there are no more."
+        nonlocal text
+        chunk = next(chunks, None)
+        text += text_decoder.decode(chunk or b"", final=chunk is None)
+        return chunk is not None
+
+    match = RESULTS_START.search(text)
+    while match is None:
+        if not read_more():
+            yield json.loads(text)
+            return
+        match = RESULTS_START.search(text)
+
+    # The results are the last thing in the response, so this is the rest of
+    # it without them.
+    yield json.loads(text[: match.end()] + "]}}")
+    position = match.end()
+
+    while True:
+        position = ITEM_SEPARATOR.match(text, position).end()
+        if position == len(text):
+            if not read_more():
+                raise ValueError("The JSON ended before the results did.")
+            continue
+        if text[position] == "]":
+            break
+        try:
+            result, position = decoder.raw_decode(text, position)
+        except ValueError:
+            # Probably because we don't have all of this result yet.
+            if not read_more():
+                raise
+            continue
+        yield result
+        text = text[position:]
+        position = 0
+
+    # Read the rest, so the connection can be used again.
+    for chunk in chunks:
+        pass
+
+
+def compact_book(book):
+    """
+    Given the dict of a newspaper-book tag from the API, returns a dict of only
+    the parts the reader needs.
+    """
+    return {key: book[key] for key in ("id", "webTitle", "webUrl") if key in book}
+
+
+def image_name(url):
+    "Returns the name, without an extension, that the image at url is saved as."
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def image_variants(data, widths, quality):
+    """
+    Given the bytes of an image, returns a list of tuples of the width,
+    extension and bytes of a JPEG and a WebP copy of it at each of the widths,
+    or at its own width if that's smaller.
+    Returns an empty list if Pillow isn't installed or can't read the image.
+    """
+    try:
+        from PIL import Image, features
+    except ImportError:
+        return []
+
+    variants = []
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            if image.mode == "RGB":
+                original = image.copy()
+            else:
+                # JPEGs have no transparency, so put the image on white.
+                rgba = image.convert("RGBA")
+                original = Image.new("RGB", rgba.size, "white")
+                original.paste(rgba, mask=rgba.getchannel("A"))
+
+        formats = [("jpg", "JPEG", {"optimize": True, "progressive": True})]
+        if features.check("webp"):
+            formats.append(("webp", "WEBP", {}))
+
+        for width in sorted(set(min(width, original.width) for width in widths)):
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.LANCZOS)
+            for extension, image_format, options in formats:
+                output = io.BytesIO()
+                resized.save(output, image_format, quality=quality, **options)
+                variants.append((width, extension, output.getvalue()))
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return []
+
+    return variants
+
+
+def tokenize(text):
+    """
+    Returns a list of the words in a string of text or HTML, lowercased and
+    without accents, tags or entities.
+    """
+    text = unescape(re.sub(r"<[^>]*>", " ", text))
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def stem(word):
+    """
+    Returns a simple stem of a lowercase word, by removing some common English
+    suffixes, so that eg 'election' and 'elections' are found together.
+    stem() in reader.js does the same thing, and must be kept in step.
+    """
+    if len(word) > 4 and word.endswith("ies"):
+        word = word[:-3] + "y"
+    elif word.endswith("sses"):
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        word = word[:-1]
+
+    for suffix in ("ing", "ed", "ly"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[: -len(suffix)]
+
+    return word
+
+
+def search_terms(article):
+    """
+    Returns a sorted list of the stemmed words in an article's headline,
+    standfirst, byline and body, as used in the search index.
+    """
+    fields = article["fields"]
+    terms = set()
+    for field in ("headline", "standfirst", "byline", "body"):
+        for word in tokenize(fields.get(field) or ""):
+            if len(word) > 1 and word not in SEARCH_STOP_WORDS:
+                terms.add(stem(word))
+    return sorted(terms)
+
+
+# Its 'seconds' is a dict of the seconds spent in each of our Jinja filters, in
+# this thread, since render_timed() last started rendering an article.
+filter_timings = threading.local()
+
+
+def timed_filter(name, function):
+    "Returns a version of a Jinja filter that adds its time to filter_timings."
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = filter_timings.__dict__.setdefault(
+                "seconds", collections.defaultdict(float)
+            )
+            seconds[name] += time.perf_counter() - started
+
+    return wrapper
+
+
+def make_jinja_env(compiled_dir=None, sources=None):
+    """
+    Returns the Jinja Environment, with our filters, used to render articles.
+    If compiled_dir is set, the templates are loaded from the Python modules
+    that compile_templates() saved there, rather than from their source. If
+    sources, a dict of each template's name and source, is set, the templates
+    are those rather than the files in TEMPLATES_DIR.
+    """
+    from jinja2 import DictLoader, Environment, FileSystemLoader, ModuleLoader
+    from typogrify.templatetags import jinja_filters
+
+    if compiled_dir is not None:
+        loader = ModuleLoader(compiled_dir)
+    elif sources is not None:
+        loader = DictLoader(sources)
+    else:
+        loader = FileSystemLoader(TEMPLATES_DIR)
+    jinja_env = Environment(loader=loader)
+    jinja_env.filters["typogrify"] = timed_filter("typogrify", jinja_filters.typogrify)
+    jinja_env.filters["transform_body"] = timed_filter("transform_body", transform_body)
+    return jinja_env
+
+
+def template_version(source=None):
+    """
+    Returns a string that changes whenever the article template or
+    RENDER_VERSION changes, so that articles are re-rendered, and the template
+    compiled again, when their output would be different.
+    source is the bytes of the template, which are read from its file if None.
+    """
+    if source is None:
+        with open(os.path.join(TEMPLATES_DIR, "article.html"), "rb") as fp:
+            source = fp.read()
+    return "%s-%s" % (RENDER_VERSION, hashlib.md5(source).hexdigest())
+
+
+def compiled_templates_path(compiled_templates_dir, version):
+    """
+    Returns the path of the directory within compiled_templates_dir that the
+    templates of version (from template_version()) are compiled to, for this
+    version of Jinja.
+    """
+    import jinja2
+
+    return os.path.join(compiled_templates_dir, "%s-%s" % (version, jinja2.__version__))
+
+
+def compile_templates(compiled_templates_dir):
+    """
+    Compiles the templates, as they are now, to Python modules in the directory
+    from compiled_templates_path(), unless that's already been done.
+    Returns the path of the directory and the templates' template_version().
+    """
+    sources = {}
+    for name in os.listdir(TEMPLATES_DIR):
+        with open(os.path.join(TEMPLATES_DIR, name), "rb") as fp:
+            sources[name] = fp.read()
+    # The version of what we compile, even if the files change meanwhile.
+    version = template_version(sources["article.html"])
+    compiled_dir = compiled_templates_path(compiled_templates_dir, version)
+
+    if not os.path.isdir(compiled_dir):
+        os.makedirs(compiled_templates_dir, exist_ok=True)
+        # Compile into a temporary directory and then rename it, so that other
+        # processes never load a half-compiled directory.
+        temp_dir = tempfile.mkdtemp(dir=compiled_templates_dir, prefix=".")
+        make_jinja_env(
+            sources={name: source.decode("utf-8") for name, source in sources.items()}
+        ).compile_templates(temp_dir, zip=None)
+        try:
+            os.rename(temp_dir, compiled_dir)
+        except OSError:
+            # Another process got there first.
+            shutil.rmtree(temp_dir)
+
+    return compiled_dir, version
+
+
+def remove_old_compiled_templates(compiled_templates_dir, keep):
+    """
+    Deletes the directories within compiled_templates_dir that templates were
+    compiled to before the keep directory was. Ones compiled since might be
+    in use by other processes, so are left alone.
+    """
+    keep_time = os.path.getmtime(keep)
+    for name in os.listdir(compiled_templates_dir):
+        path = os.path.join(compiled_templates_dir, name)
+        if (
+            not name.startswith(".")
+            and path != keep
+            and os.path.getmtime(path) < keep_time
+        ):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load_template(compiled_templates_dir, version):
+    """
+    Returns the article template of version (from template_version()), loaded
+    from the Python modules it was compiled to by compile_templates(), which
+    compiles it first if necessary.
+    Raises ScraperError if the template has changed since version, and that
+    version isn't already compiled.
+    """
+    compiled_dir = compiled_templates_path(compiled_templates_dir, version)
+    if not os.path.isdir(compiled_dir):
+        compiled_dir, compiled_version = compile_templates(compiled_templates_dir)
+        if compiled_version != version:
+            raise ScraperError(
+                "The article template has changed since this run started."
+            )
+    return make_jinja_env(compiled_dir).get_template("article.html")
+
+
+def render_timed(template, article):
+    """
+    Renders an article's HTML with template.
+    Returns a tuple of the HTML, the wall-clock and CPU seconds it took, and a
+    dict of the seconds spent in each filter.
+    """
+    filter_timings.seconds = collections.defaultdict(float)
+    started = time.perf_counter()
+    started_cpu = time.process_time()
+    html = template.render(article=article)
+    return (
+        html,
+        time.perf_counter() - started,
+        time.process_time() - started_cpu,
+        dict(filter_timings.seconds),
+    )
+
+
+# The article template used by each process in a GuardianGrabber's render pool.
+worker_template = None
+
+
+def init_render_worker(compiled_templates_dir, version):
+    "Sets up the template in a new render pool process."
+    global worker_template
+    worker_template = load_template(compiled_templates_dir, version)
+
+
+def render_in_worker(article):
+    """
+    Renders an article's HTML within a render pool process.
+    Returns the same as render_timed().
+    """
+    return render_timed(worker_template, article)
 
 
 class GuardianGrabber:
-    def __init__(self):
+    def __init__(self, config_file=None, profile=False, use_async=False):
+
+        # The path to the config file, if it's not scraper.cfg next to this
+        # script.
+        self.config_file = config_file or sys.path[0] + "/scraper.cfg"
+
+        # If True, every article is rendered in this process with cProfile
+        # running, and the profiles of the slowest are saved in
+        # self.profile_dir.
+        self.profile = profile
+
+        # If True, pages of articles are fetched and processed with asyncio,
+        # overlapping the fetching, rendering and saving of different pages.
+        self.use_async = use_async
+
+        # Used to add to self.metrics from several threads at once.
+        self.metrics_lock = threading.Lock()
 
         self.load_config()
 
-    def load_config(self):
-        "Sets initial object variables, and loads others from the scraper.cfg file"
+        # One pooled, keep-alive HTTP session used for every request we make.
+        # It's set up by the session property when it's first needed, rather
+        # than in load_config(), so that it survives the config being reloaded.
+        self._session = None
 
-        # First, variables which are set here, not in the config file.
+        # A ProcessPoolExecutor for rendering articles, if render_workers is
+        # more than 1. Started when it's first needed.
+        self.render_pool = None
+
+        # The sqlite3 connection to the render cache, if render_cache is True.
+        # Opened when it's first needed. The lock is held while using it, as
+        # it can be shared by several threads building different issues.
+        self.render_cache = None
+        self.render_cache_lock = threading.RLock()
+
+        # How many requests we've made to the Content API on each day, UK time.
+        # Like {'2023-02-25': 12}.
+        self.api_calls = {}
+
+        # Set by signal handlers when running as a daemon.
+        self.reload_requested = False
+        self.stop_requested = False
+
+    def reset_issue(self):
+        """
+        Sets the object variables that describe the issue being fetched, ready
+        for a new run.
+        """
 
         # The array used to create the contents.json once all processin's done:
         #
@@ -69,8 +644,20 @@ class GuardianGrabber:
         #
         # Then, after fetching we'll put all the values from this into
         # self.contents['books'] in the correct order.
+        #
+        # Each article is the small dict returned by make_contents_entry().
+        # If self.keep_full_articles is True, each book's 'meta' is all of its
+        # data, and all of each article's data is kept in self.spool.
         self.fetched_books = {}
 
+        # A temporary file of the JSON of every article's full data, if
+        # self.keep_full_articles is True. And where each article's JSON is in
+        # it, like {'0a1b2c...html': (offset, length), ...}.
+        if getattr(self, "spool", None) is not None:
+            self.spool.close()
+        self.spool = None
+        self.spooled = {}
+
         # Will be set depending on what issue we're fetching.
         # A datetime object.
         self.issue_date = None
@@ -79,6 +666,88 @@ class GuardianGrabber:
         # self.issue_date
         self.issue_archive_dir = ""
 
+        # Will be set in start() to the directory this run's files are saved
+        # in. Usually the same as self.issue_archive_dir, but if atomic_publish
+        # is on it's a new directory within self.archive_dir + '.builds/'.
+        self.output_dir = ""
+
+        # When we've worked out what date we're on, this will be either
+        # 'guardian' or 'observer'.
+        self.paper_name = ""
+
+        # A record of every HTTP request made during this run, including retries.
+        # A list of dicts like:
+        # {'url': '...', 'status': 200, 'seconds': 0.81, 'bytes': 1234567,
+        #  'attempt': 0, 'page': 1}
+        # 'status' is None if there was no response at all, and 'page' is None
+        # if it wasn't a request for a page of articles.
+        self.request_log = []
+
+        # The manifest.json saved in the issue's directory by the previous run,
+        # if any, and the one we're making during this run. Both are like:
+        # {
+        #   '0a1b2c...html': {
+        #       'id': 'world/2010/jul/07/spain-spain',
+        #       'file': '0a1b2c...html',  # Or '0a1b2c....3d4e5f...html'
+        #       'lastModified': '2010-07-07T09:12:00Z',
+        #       'fingerprint': '9f8e7d...',
+        #       'template': '2-ead948...',  # template_version() it's rendered with
+        #       'book': {'id': 'theguardian/mainsection', ...},
+        #       'entry': {...},  # From make_contents_entry()
+        #       'terms': ['spain', ...],  # From search_terms(), if search_index
+        #       'images': ['3c4d5e...', ...],  # image_name()s, if mirror_images
+        #   },
+        #   ...
+        # }
+        # The keys are from article_filename(), and 'file' is the name each
+        # article's HTML is saved as, which differs if hashed_filenames.
+        self.old_manifest = {}
+        self.manifest = {}
+
+        # How many articles were new, changed, the same as, or missing compared
+        # to the previous run.
+        self.counts = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+
+        # How long each stage of this run took, saved as metrics.json.
+        # 'stages' is like:
+        # {'fetch': {'count': 3, 'wall': 2.41, 'cpu': 0.05}, ...}
+        # 'articles' has a dict for each article rendered, like:
+        # {'id': '...', 'file': '...', 'wall': 0.12, 'cpu': 0.11,
+        #  'filters': {'typogrify': 0.07, 'transform_body': 0.02}}
+        self.metrics = {
+            "stages": {},
+            "articles": [],
+            "render_cache": {"hits": 0, "misses": 0},
+        }
+
+        # Whether each thumbnail and contributor image URL we've checked exists,
+        # if check_images is True. Like {'https://...jpg': True, ...}.
+        self.image_checks = {}
+
+        # The files in images_dir, if mirror_images is True, like
+        # {'0a1b2c...': ['0a1b2c...-265.jpg', '0a1b2c...-265.webp', ...], ...}.
+        # Keyed by image_name(). Set when it's first needed. An empty list means
+        # the image couldn't be downloaded this run.
+        self.image_files = None
+
+        # True if we're rebuilding the issue from the raw API data saved in
+        # self.raw_dir, rather than fetching it.
+        self.rerendering = False
+
+        # The slowest articles' profiles, if self.profile is True. A heap of
+        # (seconds, filename, cProfile.Profile) tuples.
+        self.profiles = []
+
+    def load_config(self):
+        "Sets initial object variables, and loads others from the scraper.cfg file"
+
+        started = time.perf_counter()
+        started_cpu = time.process_time()
+
+        # First, variables which are set here, not in the config file.
+
+        self.reset_issue()
+
         # The URLs of the full list of the current issue of the Guardian and
         # Observer.
         self.source_urls = {
@@ -86,17 +755,23 @@ class GuardianGrabber:
             "observer": "http://www.theguardian.com/theobserver",
         }
 
-        # When we've worked out what date we're on, this will be either
-        # 'guardian' or 'observer'.
-        self.paper_name = ""
+        # The most articles the API will return per page.
+        self.page_size = 200
+
+        # Used to space out API requests, which might be made from several
+        # threads at once. 'last' is the time of the latest, from
+        # time.monotonic(). It's a dict so that it's shared with the copies
+        # made by issue_grabber().
+        self.request_lock = threading.Lock()
+        self.last_request_time = {"last": 0}
 
-        # Will be the lockfile we check to make sure this script doesn't run
-        # multiple times.
-        self.lockfile_path = sys.path[0] + "/lock.pid"
+        # Will be the lockfile we check to make sure this script doesn't build
+        # the same issue more than once at a time. Set by issue_lock().
+        self.lockfile_path = ""
 
         # Second, load stuff from the config file.
 
-        config_file = sys.path[0] + "/scraper.cfg"
+        config_file = self.config_file
         config = configparser.ConfigParser()
 
         try:
@@ -110,72 +785,248 @@ class GuardianGrabber:
 
         self.verbose = config.getboolean("Settings", "verbose")
 
-        # Set up the template we'll use to render each article to a file.
-        jinja_env = Environment(loader=PackageLoader("scraper", "../templates"))
-        jinja_env.filters["typogrify"] = jinja_filters.typogrify
-
-        def replace_interactives(html, article_url):
-            """Jinja filter to replace the <gu-atom> "interactive" elements with link
-            to the article.
-            Because we can't do anything useful with them and they just show as
-            'default' or 'interactive' otherwise.
-            """
-            soup = BeautifulSoup(html, 'html.parser')
-
-            def replace_element_with_link(element, url, text):
-                """
-                Replace a soup element with a paragraph and a link to a URL.
-
-                element - The element to replace
-                url - The URL to link to
-                text - The text for the link
-                """
-                p = soup.new_tag("p", **{"class": "dp-interactive"})
-                a = soup.new_tag("a", href=url, target="_new")
-                a.string = instruction
-                p.append(a)
-                element.replace_with(p)
-
-            # Replace:
-            #   <figure ...>
-            #     <gu-atom data-atom-type="interactive" ...>...</gu-atom>
-            #   </figure>
-            # There's no iframe, no interactive to link specifically to.
-            for gu_atom in soup.find_all("gu-atom", {"data-atom-type": "interactive"}):
-                figure = gu_atom.find_parent("figure")
-                instruction = "To view ‘interactive’ open article in new window"
-                replace_element_with_link(figure, article_url, instruction)
-
-            # Replace:
-            #   <figure data-canonical-url="[interactive url]" ...>
-            #     <iframe ...>...</iframe>
-            #   </figure>
-            # We can link directly to the interactive on its own page
-            for figure in soup.find_all("figure", {"class": "element-interactive"}):
-                if "data-canonical-url" in figure.attrs:
-                    interactive_url = figure.attrs["data-canonical-url"]
-                    instruction = "Open ‘interactive’ in new window"
-                    replace_element_with_link(figure, interactive_url, instruction)
-
-            return str(soup)
-
-        jinja_env.filters['replace_interactives'] = replace_interactives
-
-        def replace_grids(html):
-            """
-            Remove any <img alt="Grid"> elements.
-            Used for the background of an interactive image thing on the website, but
-            displays as a full-width empty grid on our site.
-            """
-            soup = BeautifulSoup(html, 'html.parser')
-            for grid in soup.find_all("img", {"alt": "Grid"}):
-                figure = grid.find_parent("figure")
-                figure.decompose()
-            return str(soup)
-
-        jinja_env.filters['replace_grids'] = replace_grids
-
-        self.template = jinja_env.get_template("article.html")
+        # Where each issue's lockfile, like lock-2023-02-25.pid, is kept while
+        # it's being built.
+        self.lock_dir = config.get("Settings", "lock_dir", fallback=sys.path[0] + "/")
+        if not self.lock_dir.endswith("/"):
+            self.lock_dir += "/"
+
+        # The Content API endpoint we fetch each page of articles from.
+        self.api_url = config.get(
+            "Settings", "api_url", fallback="http://content.guardianapis.com/search"
+        )
+
+        # 'compact' makes contents.json only contain what the reader needs to
+        # navigate the issue. 'full' includes all of each article's API data.
+        self.contents_format = config.get(
+            "Settings", "contents_format", fallback="compact"
+        )
+        if self.contents_format not in ("compact", "full"):
+            raise ScraperError(
+                "contents_format should be 'compact' or 'full', not '%s'"
+                % self.contents_format
+            )
+
+        # If True, also save all of each article's API data in
+        # contents-full.json, whatever the contents_format.
+        self.full_contents = config.getboolean(
+            "Settings", "full_contents", fallback=False
+        )
+
+        # We only need to keep all of each article's data, rather than the
+        # little that make_contents_entry() returns, if we're saving all of it.
+        # Even then it's kept in a temporary file, self.spool, rather than in
+        # memory.
+        self.keep_full_articles = self.contents_format == "full" or self.full_contents
+
+        # If True, and there's a manifest.json from a previous run, first ask
+        # the API for only the IDs and lastModified times of the issue's
+        # articles, and then only fetch all the data for new or changed ones.
+        # Requires contents_format = compact and full_contents = 0.
+        self.probe_changes = config.getboolean(
+            "Settings", "probe_changes", fallback=False
+        )
+
+        # If True, also save a small contents-index.json listing the books in
+        # order, and one contents file per book, so that a reader can load each
+        # book's contents only when it's needed.
+        self.contents_shards = config.getboolean(
+            "Settings", "contents_shards", fallback=False
+        )
+
+        # If more than 0, the contents get a version number, which goes up
+        # whenever a run changes them, and we save files describing what's
+        # changed since each of this many previous versions. A reader can then
+        # fetch only what's changed since the version it has.
+        self.contents_deltas = config.getint("Settings", "contents_deltas", fallback=0)
+
+        # When running as a daemon, the fewest and most seconds to wait between
+        # checking for changes to the issue. It's checked as often as possible
+        # around midnight, UK time, when the new issue appears, and then less
+        # often while nothing's changing.
+        self.daemon_min_interval = config.getint(
+            "Settings", "daemon_min_interval", fallback=600
+        )
+        self.daemon_max_interval = config.getint(
+            "Settings", "daemon_max_interval", fallback=3600
+        )
+
+        # When running as a daemon, the most requests to make to the API each
+        # day, UK time. 0 for no limit.
+        self.daily_api_calls = config.getint("Settings", "daily_api_calls", fallback=0)
+
+        # If more than 0, also save the HTML of every this-many consecutive
+        # articles, in reading order, in a single 'pack' file. So a reader can
+        # load several articles with one request.
+        self.pack_size = config.getint("Settings", "pack_size", fallback=0)
+
+        # If True, every file we save also gets gzipped (.gz) and, if the
+        # brotli module is installed, brotli-compressed (.br) copies alongside
+        # it, for the web server to send as they are.
+        self.precompress = config.getboolean("Settings", "precompress", fallback=False)
+        self.gzip_level = config.getint("Settings", "gzip_level", fallback=9)
+        self.brotli_level = config.getint("Settings", "brotli_level", fallback=11)
+
+        if self.precompress and brotli is None:
+            self.message("The brotli module isn't installed; only saving .gz files.")
+
+        # If True, each run saves its files in a new directory, starting with
+        # hard links to the files already published, and then replaces the
+        # issue's directory with a symlink to it in one go. So readers never
+        # see a half-finished issue.
+        self.atomic_publish = config.getboolean(
+            "Settings", "atomic_publish", fallback=False
+        )
+
+        # Should we only render and save articles that have changed since the
+        # previous run for the same issue?
+        self.incremental = config.getboolean("Settings", "incremental", fallback=True)
+
+        # How many pages of articles to fetch from the API at once, and the
+        # minimum number of seconds between starting each request.
+        self.fetch_concurrency = max(
+            1, config.getint("Settings", "fetch_concurrency", fallback=1)
+        )
+        self.fetch_interval = config.getfloat("Settings", "fetch_interval", fallback=1)
+
+        # How many times to retry a request that timed out or got a 429 or 5xx
+        # response, and the base and maximum number of seconds to wait between
+        # retries.
+        self.max_retries = config.getint("Settings", "max_retries", fallback=3)
+        self.retry_backoff = config.getfloat("Settings", "retry_backoff", fallback=1)
+        self.retry_backoff_max = config.getfloat(
+            "Settings", "retry_backoff_max", fallback=60
+        )
+
+        # If True, save a metrics.json in each issue's directory, with how long
+        # each stage of the run took, and each article took to render.
+        self.metrics_file = config.getboolean("Settings", "metrics", fallback=True)
+
+        # If set, also save the run's metrics to this file in the Prometheus
+        # text format, eg for node_exporter's textfile collector.
+        self.prometheus_textfile = config.get(
+            "Settings", "prometheus_textfile", fallback=""
+        )
+
+        # When run with --profile, how many of the slowest articles to save
+        # profiles of, and the directory to save them in.
+        self.profile_articles = config.getint(
+            "Settings", "profile_articles", fallback=5
+        )
+        self.profile_dir = config.get(
+            "Settings", "profile_dir", fallback=sys.path[0] + "/profiles/"
+        )
+
+        # If True, make a HEAD request for each article's thumbnail and
+        # contributor image, and leave out any that are missing.
+        self.check_images = config.getboolean(
+            "Settings", "check_images", fallback=False
+        )
+
+        # If True, download each article's thumbnail and contributor image
+        # into images_dir, which all issues share, and use our copies instead
+        # of the originals. If Pillow is installed, each one is saved as a
+        # JPEG and a WebP at each of image_widths pixels wide, for browsers to
+        # choose from. Otherwise it's saved as it is. image_url_prefix is the
+        # URL of images_dir, relative to the reader's page.
+        self.mirror_images = config.getboolean(
+            "Settings", "mirror_images", fallback=False
+        )
+        self.images_dir = config.get(
+            "Settings", "images_dir", fallback=self.archive_dir + "images/"
+        )
+        if not self.images_dir.endswith("/"):
+            self.images_dir += "/"
+        self.image_url_prefix = config.get(
+            "Settings", "image_url_prefix", fallback="archive/images/"
+        )
+        self.image_widths = [
+            int(width)
+            for width in config.get(
+                "Settings", "image_widths", fallback="265,530"
+            ).split(",")
+        ]
+        self.image_quality = config.getint("Settings", "image_quality", fallback=80)
+        # How many images to download at once.
+        self.image_workers = config.getint("Settings", "image_workers", fallback=8)
+
+        if self.mirror_images and importlib.util.find_spec("PIL") is None:
+            self.message("Pillow isn't installed; images won't be resized.")
+
+        # If True, save each article's data from the API, gzipped, in a dated
+        # directory within raw_dir. The issue can then be rebuilt from it
+        # with --rerender, without using the API.
+        self.save_raw = config.getboolean("Settings", "save_raw", fallback=False)
+        self.raw_dir = config.get("Settings", "raw_dir", fallback=sys.path[0] + "/raw/")
+        if not self.raw_dir.endswith("/"):
+            self.raw_dir += "/"
+
+        # If True, each page of articles from the API is decoded a piece at a
+        # time as it arrives, rather than all at once. The first page's
+        # articles are processed as they arrive, while it's still downloading.
+        self.stream_decode = config.getboolean(
+            "Settings", "stream_decode", fallback=False
+        )
+
+        # If True, save a search.json alongside contents.json, indexing the
+        # stemmed words of every article so the reader can search the issue.
+        self.search_index = config.getboolean(
+            "Settings", "search_index", fallback=False
+        )
+
+        # If True, each article's HTML file is named by a hash of its
+        # contents, so it never changes once written and can be cached
+        # forever. contents.json says which file is each article's current
+        # one. Old versions are removed along with the issue.
+        self.hashed_filenames = config.getboolean(
+            "Settings", "hashed_filenames", fallback=False
+        )
+
+        # If True, keep the HTML of every article we render in an SQLite
+        # database, keyed by its fingerprint, and use it instead of rendering
+        # the same article again. Used across runs and issues. The least
+        # recently used articles are removed when the database is bigger than
+        # render_cache_size megabytes.
+        self.render_cache_enabled = config.getboolean(
+            "Settings", "render_cache", fallback=False
+        )
+        self.render_cache_file = config.get(
+            "Settings", "render_cache_file", fallback=sys.path[0] + "/render_cache.db"
+        )
+        self.render_cache_size = config.getfloat(
+            "Settings", "render_cache_size", fallback=200
+        )
+
+        # How many processes to render articles with. 1 renders them in this
+        # process, one at a time. 0 uses one process per CPU.
+        self.render_workers = config.getint("Settings", "render_workers", fallback=1)
+        if self.render_workers == 0:
+            self.render_workers = os.cpu_count() or 1
+
+        # Where the article template is compiled to Python modules, so that
+        # it doesn't have to be compiled from its source on every run. It's
+        # compiled again whenever it, RENDER_VERSION or Jinja changes.
+        self.compiled_templates_dir = config.get(
+            "Settings",
+            "compiled_templates_dir",
+            fallback=sys.path[0] + "/compiled_templates/",
+        )
+
+        # Changes whenever the template or RENDER_VERSION changes, so that
+        # articles are re-rendered when their output would be different.
+        self.template_version = template_version()
+
+        # The template we'll use to render each article to a file. Loaded by
+        # the template property when it's first needed.
+        self._template = None
+
+        # How long loading the config and template took. Added to each run's
+        # metrics.
+        self.config_timing = {
+            "count": 1,
+            "wall": time.perf_counter() - started,
+            "cpu": time.process_time() - started_cpu,
+        }
 
     def checkForOldProcesses(self):
         """
@@ -187,13 +1038,16 @@ class GuardianGrabber:
             lockfile = open(self.lockfile_path, "r")
             lockfile.seek(0)
             old_pid = lockfile.readline()
-            if old_pid:
+            if old_pid == str(os.getpid()):
+                # Left by this process, eg by an earlier run of the daemon.
+                self.removeLockfile()
+            elif old_pid:
                 try:
                     # Doesn't kill it, but checks to see if the pid exists.
                     os.kill(int(old_pid), 0)
                     try:
                         os.kill(int(old_pid), signal.SIGQUIT)
-                        self.removeLockfile
+                        self.removeLockfile()
                         warnings.warn(
                             "Lockfile found ("
                             + self.lockfile_path
@@ -214,7 +1068,7 @@ class GuardianGrabber:
                         )
                 except OSError:
                     # Process not running. Just delete file.
-                    self.removeLockfile
+                    self.removeLockfile()
             else:
                 warnings.warn(
                     "Lockfile found ("
@@ -231,18 +1085,140 @@ class GuardianGrabber:
         lockfile.close()
 
     def removeLockfile(self):
-        os.remove(self.lockfile_path)
+        if os.path.exists(self.lockfile_path):
+            os.remove(self.lockfile_path)
 
-    def start(self):
+    @contextlib.contextmanager
+    def issue_lock(self, issue_date):
         """
-        The main action. Fetches all of the required data for today's paper and
-        saves it locally.
+        Context manager that holds a lockfile for the issue on the datetime
+        issue_date, like lock-2023-02-25.pid in self.lock_dir, while it's
+        being built. So
+        different issues can be built at the same time, but not the same one.
         """
+        self.lockfile_path = "%slock-%s.pid" % (
+            self.lock_dir,
+            issue_date.strftime("%Y-%m-%d"),
+        )
         self.checkForOldProcesses()
         self.makeLockfile()
 
+        try:
+            yield
+        finally:
+            self.removeLockfile()
+
+    def start(self, issue_date=None):
+        """
+        The main action. Fetches all of the required data for today's paper and
+        saves it locally.
+        issue_date is an optional datetime, to fetch a different day's paper.
+        """
+        issue_date = issue_date or self.london_now()
+
+        with self.issue_lock(issue_date):
+            self.build_issue(issue_date)
+
+    def rerender(self, issue_date=None):
+        """
+        Rebuilds a day's paper from the raw API data saved by previous runs
+        with save_raw on, without using the API. Every article is rendered
+        again, in case a filter has changed.
+        issue_date is an optional datetime, for a day other than today.
+        """
+        issue_date = issue_date or self.london_now()
+
+        with self.issue_lock(issue_date):
+            self.build_issue(issue_date, rerender=True)
+
+    def build_issues(self, issue_dates):
+        """
+        Builds the issues for a list of datetimes at the same time, each in its
+        own thread, using copies of this object made by issue_grabber().
+        So they share one HTTP session, render pool and render cache, and the
+        spacing out of API requests.
+        Only issues still kept in the archive (see KEEP_DAYS) can be built.
+        """
+        today = self.london_now().date()
+        for issue_date in issue_dates:
+            if not 0 <= (today - issue_date.date()).days < KEEP_DAYS:
+                raise ScraperError(
+                    "Can only build the issues from the past %s days, not %s."
+                    % (KEEP_DAYS, issue_date.strftime("%Y-%m-%d"))
+                )
+
+        # Start these now so the copies share them, rather than each making
+        # its own.
+        if self.render_workers > 1 and self.render_pool is None:
+            self.render_pool = self.make_render_pool()
+        if self.render_cache_enabled and self.render_cache is None:
+            self.open_render_cache()
+        self.session
+        self.template
+
+        errors = []
+
+        # No more than KEEP_DAYS issues can get this far.
+        with ThreadPoolExecutor(
+            max_workers=min(len(issue_dates), KEEP_DAYS)
+        ) as executor:
+            futures = {
+                executor.submit(self.issue_grabber().start, issue_date): issue_date
+                for issue_date in issue_dates
+            }
+            for future, issue_date in futures.items():
+                try:
+                    future.result()
+                except ScraperError as e:
+                    errors.append("%s: %s" % (issue_date.strftime("%Y-%m-%d"), e))
+
+        if errors:
+            raise ScraperError("\n".join(errors))
+
+    @property
+    def session(self):
+        "The HTTP session, which is set up the first time it's used."
+        if self._session is None:
+            self._session = self.make_session()
+        return self._session
+
+    @property
+    def template(self):
+        "The article template, which is loaded the first time it's used."
+        if self._template is None:
+            with self.timed("template"):
+                self._template = load_template(
+                    self.compiled_templates_dir, self.template_version
+                )
+        return self._template
+
+    def issue_grabber(self):
+        """
+        Returns a copy of this object for building a different issue at the same
+        time. It shares this object's settings, HTTP session, render pool,
+        render cache, and API request spacing and counts.
+        """
+        grabber = copy.copy(self)
+        grabber.reset_issue()
+        return grabber
+
+    def build_issue(self, issue_date=None, rerender=False):
+        """
+        Fetches all of the required data for a day's paper and saves it locally.
+        issue_date is an optional datetime; today's paper is fetched otherwise.
+        If rerender is True, the articles are read from self.raw_dir instead of
+        fetched.
+        Doesn't use the lockfile; start() and run_daemon() handle that.
+        """
+        self.reset_issue()
+        self.rerendering = rerender
+
+        started = time.perf_counter()
+        started_cpu = time.process_time()
+        self.metrics["stages"]["config"] = self.config_timing
+
         # Sets the date and paper (guardian or observer).
-        self.set_issue_date()
+        self.set_issue_date(issue_date)
 
         if self.issue_date != "":
             self.issue_archive_dir = (
@@ -254,40 +1230,322 @@ class GuardianGrabber:
             )
 
         # Make the directory we'll save the HTML files in.
-        if not os.path.exists(self.issue_archive_dir):
-            os.makedirs(self.issue_archive_dir)
+        self.prepare_output_dir()
+
+        self.load_manifest()
 
         # Get all of today's articles and save HTML versions to disk.
-        self.fetch_articles()
+        if rerender:
+            self.load_raw_articles()
+        else:
+            self.fetch_articles()
+
+        with self.timed("sort"):
+            self.sort_articles()
 
-        self.sort_articles()
+        self.counts["removed"] = len(set(self.old_manifest) - set(self.manifest))
+        self.message(
+            "Articles added: %(added)s, changed: %(changed)s, "
+            "unchanged: %(unchanged)s, removed: %(removed)s." % self.counts
+        )
 
         # Delete the day-before-yesterday's files.
         # (Not yesterday's, just in case someone is currently viewing them.)
-        old_date = self.issue_date - datetime.timedelta(2)
+        old_date = self.issue_date - datetime.timedelta(KEEP_DAYS)
         old_dir = self.archive_dir + old_date.strftime("%Y-%m-%d")
-        if os.path.exists(old_dir):
+        if os.path.islink(old_dir):
+            os.remove(old_dir)
+            removed_old_dir = True
+        elif os.path.exists(old_dir):
             shutil.rmtree(old_dir)
+            removed_old_dir = True
+        else:
+            removed_old_dir = False
+        self.remove_builds(old_date.strftime("%Y-%m-%d"))
+        if self.mirror_images and removed_old_dir:
+            self.remove_unused_images()
+        old_raw_dir = self.raw_dir + old_date.strftime("%Y-%m-%d")
+        if os.path.exists(old_raw_dir):
+            shutil.rmtree(old_raw_dir)
+
+        if self.pack_size > 0:
+            self.write_article_packs()
 
         # Write all the information about this issue to a contents.json file
         # within the dated folder.
+        with self.timed("contents"):
+            if self.contents_deltas > 0:
+                self.write_contents_deltas()
+
+            if self.contents_format == "full":
+                self.write_file_chunks("contents.json", self.full_contents_chunks())
+            else:
+                self.write_file("contents.json", json_dumps(self.compact_contents()))
+
+            if self.full_contents:
+                self.write_file_chunks(
+                    "contents-full.json", self.full_contents_chunks()
+                )
+
+            if self.contents_shards:
+                self.write_contents_shards()
+
+        if self.search_index:
+            with self.timed("search"):
+                self.write_search_index()
+
+        self.write_file("manifest.json", json_dumps(self.manifest))
+
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+        if self.save_raw and not rerender:
+            self.write_raw_index()
+
+        self.metrics["stages"]["total"] = {
+            "count": 1,
+            "wall": time.perf_counter() - started,
+            "cpu": time.process_time() - started_cpu,
+        }
+        self.write_metrics()
+
+        if self.render_cache is not None:
+            self.trim_render_cache()
+
+        self.publish_output_dir()
+
+    def run_daemon(self):
+        """
+        Keeps running, re-fetching the current issue at intervals, until we get
+        a SIGTERM or SIGINT. Sending a SIGHUP reloads the config file before the
+        next fetch.
+        The interval is decided by next_interval(), and fetches are skipped if
+        they might take us over self.daily_api_calls.
+        The issue's lockfile is only held while it's being built.
+        """
+
+        def request_stop(signum, frame):
+            self.stop_requested = True
+
+        def request_reload(signum, frame):
+            self.reload_requested = True
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGHUP, request_reload)
+
+        interval = self.daemon_min_interval
+        # How many API requests the previous fetch needed.
+        calls_needed = 1
+
+        while not self.stop_requested:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload_config()
+
+            if template_version() != self.template_version:
+                self.message("The article template has changed.")
+                self.reset_template()
+
+            today = self.london_now().strftime("%Y-%m-%d")
+            calls_made = self.api_calls.get(today, 0)
+
+            if (
+                self.daily_api_calls > 0
+                and calls_made + calls_needed > self.daily_api_calls
+            ):
+                self.message(
+                    "Made %s of %s API calls today; waiting."
+                    % (calls_made, self.daily_api_calls)
+                )
+                changed = False
+            else:
+                try:
+                    issue_date = self.london_now()
+                    with self.issue_lock(issue_date):
+                        self.build_issue(issue_date)
+                    changed = (
+                        self.counts["added"]
+                        + self.counts["changed"]
+                        + self.counts["removed"]
+                    ) > 0
+                except ScraperError as e:
+                    print("ERROR: %s" % e, file=sys.stderr)
+                    changed = False
+                calls_needed = max(1, self.api_calls.get(today, 0) - calls_made)
+
+            interval = self.next_interval(interval, changed)
+            self.message("Next check in %s seconds." % interval)
+            self.sleep(interval)
+
+    def reset_template(self):
+        """
+        Makes the next run use the article template as it is now, in this
+        process and in a new render pool.
+        """
+        self.template_version = template_version()
+        self._template = None
+
+        if self.render_pool is not None:
+            self.render_pool.shutdown()
+            self.render_pool = None
+
+    def next_interval(self, interval, changed):
+        """
+        Returns how many seconds the daemon should wait before checking the issue
+        again, given the previous interval and whether the issue changed.
+
+        Around midnight, UK time, and whenever something's changed, it's
+        self.daemon_min_interval. Otherwise it doubles each time, up to
+        self.daemon_max_interval.
+        """
+        if changed or self.london_now().hour in (23, 0, 1, 2):
+            return self.daemon_min_interval
+        return min(self.daemon_max_interval, interval * 2)
+
+    def sleep(self, seconds):
+        "Sleeps for seconds, or until we're asked to stop or reload the config."
+        finish = time.monotonic() + seconds
+        while time.monotonic() < finish:
+            if self.stop_requested or self.reload_requested:
+                return
+            time.sleep(min(1, finish - time.monotonic()))
+
+    def reload_config(self):
+        """
+        Reloads the config file, keeping the existing settings if it can't.
+        The render pool is restarted so that its processes use any changed
+        template.
+        """
+        self.message("Reloading config file.")
+        # Load it into a copy of this object, so that if it's invalid none of
+        # our settings have changed.
+        reloaded = copy.copy(self)
         try:
-            with open(self.issue_archive_dir + "contents.json", mode="w") as fp:
-                json.dump(self.contents, fp)
-        except EnvironmentError:
-            raise ScraperError("Unable to write the contents.json file.")
+            reloaded.load_config()
+        except (ScraperError, configparser.Error, ValueError) as e:
+            print("ERROR: Couldn't reload config: %s" % e, file=sys.stderr)
+            return
+        self.__dict__.update(reloaded.__dict__)
+
+        if self.render_pool is not None:
+            self.render_pool.shutdown()
+            self.render_pool = None
 
-        self.removeLockfile()
+        # In case render_cache_file has changed.
+        self.close_render_cache()
 
-    def set_issue_date(self):
+    def prepare_output_dir(self):
         """
-        Works out what date's paper we're getting.
-        Sets self.issue_date and self.paper_name.
+        Sets self.output_dir to the directory this run's files will be saved in,
+        and makes sure it exists.
+
+        Usually that's the issue's directory itself. But if self.atomic_publish
+        is True it's a new directory within self.archive_dir + '.builds/',
+        starting with hard links to all of the issue's current files. Files we
+        save replace those links without changing the published files.
+        publish_output_dir() then puts it in place.
+        """
+        if not self.atomic_publish:
+            self.output_dir = self.issue_archive_dir
+            if not os.path.exists(self.output_dir):
+                os.makedirs(self.output_dir)
+            return
+
+        self.output_dir = "%s.builds/%s.%s-%s/" % (
+            self.archive_dir,
+            self.issue_date.strftime("%Y-%m-%d"),
+            datetime.datetime.now().strftime("%Y%m%d%H%M%S%f"),
+            os.getpid(),
+        )
+
+        try:
+            if os.path.isdir(self.issue_archive_dir):
+                shutil.copytree(
+                    self.issue_archive_dir, self.output_dir, copy_function=link_or_copy
+                )
+            else:
+                os.makedirs(self.output_dir)
+        except (EnvironmentError, shutil.Error) as e:
+            raise ScraperError(
+                "Unable to make the directory %s: %s" % (self.output_dir, e)
+            )
+
+    def publish_output_dir(self):
+        """
+        If self.atomic_publish is True, makes the issue's directory a symlink to
+        self.output_dir, replacing any previous one in a single step, and then
+        deletes any other builds of the issue.
+        """
+        if not self.atomic_publish:
+            return
+
+        issue_date = self.issue_date.strftime("%Y-%m-%d")
+        live_path = self.issue_archive_dir.rstrip("/")
+
+        try:
+            if os.path.isdir(live_path) and not os.path.islink(live_path):
+                # Published by a run without atomic_publish. It has to be moved
+                # out of the way before it can be replaced by a symlink.
+                os.rename(
+                    live_path, "%s.builds/%s.previous" % (self.archive_dir, issue_date)
+                )
+
+            new_link = "%s.%s.link" % (self.archive_dir, issue_date)
+            if os.path.lexists(new_link):
+                os.remove(new_link)
+            os.symlink(os.path.relpath(self.output_dir, self.archive_dir), new_link)
+            os.replace(new_link, live_path)
+        except EnvironmentError as e:
+            raise ScraperError("Unable to publish %s: %s" % (self.output_dir, e))
+
+        self.message("Published %s" % self.output_dir)
+
+        self.remove_builds(issue_date, keep=self.output_dir)
+
+    def remove_builds(self, issue_date, keep=None):
+        """
+        Deletes all of the directories made by prepare_output_dir() for the
+        issue_date (a 'YYYY-MM-DD' string), except for the keep directory.
+        """
+        builds_dir = self.archive_dir + ".builds/"
+
+        if not os.path.isdir(builds_dir):
+            return
+
+        for name in os.listdir(builds_dir):
+            if name.startswith(issue_date + ".") and builds_dir + name + "/" != keep:
+                shutil.rmtree(builds_dir + name)
+
+    def load_manifest(self):
+        """
+        Sets self.old_manifest to the contents of the manifest.json saved in
+        the issue's directory by a previous run, if there is one.
         """
-        self.issue_date = datetime.datetime.now(pytz.timezone("Europe/London"))
+        self.old_manifest = {}
 
-        # Set to a specific date for testing:
-        # self.issue_date = datetime.datetime.strptime('2023-02-26', "%Y-%m-%d")
+        if not self.incremental:
+            return
+
+        try:
+            with open(self.issue_archive_dir + "manifest.json", "rb") as fp:
+                self.old_manifest = json_loads(fp.read())
+        except FileNotFoundError:
+            pass
+        except (EnvironmentError, ValueError):
+            self.message("Couldn't read manifest.json; rendering all articles.")
+
+    def set_issue_date(self, issue_date=None):
+        """
+        Works out what date's paper we're getting: issue_date (a datetime) if
+        it's set, or today's otherwise.
+        Sets self.issue_date and self.paper_name.
+        """
+        if issue_date is None:
+            self.issue_date = self.london_now()
+        else:
+            self.issue_date = issue_date
 
         if self.issue_date.weekday() == 6:
             self.paper_name = self.contents["meta"]["paper_name"] = "observer"
@@ -307,6 +1565,8 @@ class GuardianGrabber:
             "div", {"class": "fc-container__header__description"}
         ).string
 
+        import dateutil.parser
+
         return dateutil.parser.parse(today_str)
 
     def paper_url(self, paper_date):
@@ -319,30 +1579,423 @@ class GuardianGrabber:
         else:
             return self.source_urls["guardian"]  # Monday to Saturday
 
-    def fetch_articles(self, page=1):
+    def fetch_articles(self):
         """
         Fetches all of the contents of the articles from the API and saves the
         HTMLised version to disk.
-        """
 
-        max_articles_to_fetch = 200
+        The first page tells us how many pages there are in total. The rest are
+        then fetched concurrently, up to self.fetch_concurrency at a time, and
+        processed in page order as each one arrives.
+
+        If self.probe_changes is True, and we have a manifest from a previous
+        run, fetch_changed_articles() is tried first.
+        """
+        if self.probe_changes and self.old_manifest:
+            if self.keep_full_articles:
+                self.message(
+                    "probe_changes needs contents_format = compact and "
+                    "full_contents = 0; fetching all articles."
+                )
+            elif self.fetch_changed_articles():
+                return
 
-        fetched_articles = self.fetch_page_of_articles(
-            page=page, page_size=max_articles_to_fetch
+        # Unless we're using asyncio, whose event loop mustn't wait for the
+        # rest of the page to arrive.
+        first_page = self.fetch_page_of_articles(
+            page=1, page_size=self.page_size, lazy=not self.use_async
         )
 
-        if fetched_articles is False:
+        if first_page is False:
             raise ScraperError("Error when fetching data from API.")
 
-        for article in fetched_articles:
-            # We'll put any tags we want to keep in article itself:
-            tags = article["tags"]
-            del article["tags"]
+        self.fetch_pages(
+            [
+                {"page": page, "page_size": self.page_size}
+                for page in range(2, first_page.get("pages", 1) + 1)
+            ],
+            first_page=first_page,
+        )
 
-            if len(tags) == 0:
-                self.message(
-                    "* %s has no tags; unable to put into section." % article["id"]
-                )
+    def fetch_pages(self, pages, first_page=None):
+        """
+        Fetches pages of articles concurrently, up to self.fetch_concurrency at
+        a time, and processes each one's articles in order as it arrives.
+
+        pages is a list of dicts of keyword arguments for
+        fetch_page_of_articles().
+        first_page is an optional response from fetch_page_of_articles(),
+        whose articles are processed while the other pages are downloading.
+        If self.use_async is True, fetch_pages_async() is used instead.
+        """
+        if self.use_async:
+            import asyncio
+
+            asyncio.run(self.fetch_pages_async(pages, first_page))
+            return
+
+        remaining_pages = iter(pages)
+
+        # Futures for the pages currently being fetched, in page order.
+        # We only keep a few pages in flight, so that we're not holding every
+        # page's articles in memory at once.
+        pending = collections.deque()
+
+        with ThreadPoolExecutor(max_workers=self.fetch_concurrency) as executor:
+
+            def fetch_next_page():
+                "Starts fetching the next page, if there is one."
+                kwargs = next(remaining_pages, None)
+                if kwargs is not None:
+                    pending.append(
+                        executor.submit(self.fetch_page_of_articles, **kwargs)
+                    )
+
+            for _ in range(self.fetch_concurrency):
+                fetch_next_page()
+
+            if first_page is not None:
+                if isinstance(first_page["results"], list):
+                    self.process_articles(first_page["results"])
+                else:
+                    # Its articles are still arriving, so process them a few
+                    # at a time as they do.
+                    while True:
+                        articles = list(
+                            itertools.islice(first_page["results"], STREAM_BATCH_SIZE)
+                        )
+                        if not articles:
+                            break
+                        self.process_articles(articles)
+                del first_page
+
+            while pending:
+                fetched_page = pending.popleft().result()
+                fetch_next_page()
+
+                if fetched_page is False:
+                    raise ScraperError("Error when fetching data from API.")
+
+                self.process_articles(fetched_page["results"])
+
+    def load_raw_articles(self):
+        """
+        Reads all of the issue's articles from the raw API data saved in
+        self.raw_dir by a previous run, and processes them as if they'd just
+        been fetched.
+        """
+        issue_raw_dir = self.raw_dir + self.issue_date.strftime("%Y-%m-%d") + "/"
+
+        try:
+            with open(issue_raw_dir + "index.json", "rb") as fp:
+                filenames = json_loads(fp.read())
+        except (EnvironmentError, ValueError):
+            raise ScraperError("No saved API data found in " + issue_raw_dir)
+
+        def load_raw_article(filename):
+            try:
+                with gzip.open(issue_raw_dir + filename, "rb") as fp:
+                    return json_loads(fp.read())
+            except (EnvironmentError, ValueError):
+                raise ScraperError("Unable to read " + issue_raw_dir + filename)
+
+        self.message("Rendering %s articles from %s" % (len(filenames), issue_raw_dir))
+
+        # Read the files in several threads while the previous batch of
+        # articles are being rendered.
+        with ThreadPoolExecutor() as executor:
+            articles = executor.map(load_raw_article, filenames)
+            while True:
+                batch = [article for _, article in zip(range(self.page_size), articles)]
+                if not batch:
+                    break
+                self.process_articles(batch)
+
+    def raw_path(self, filename):
+        """
+        Returns the path of the raw API data file for the article whose HTML
+        is saved as filename.
+        """
+        return "%s%s/%s.json.gz" % (
+            self.raw_dir,
+            self.issue_date.strftime("%Y-%m-%d"),
+            filename.rsplit(".", 1)[0],
+        )
+
+    def write_raw_article(self, article, raw):
+        """
+        Saves the string raw, an article's data as it came from the API, in the
+        issue's directory within self.raw_dir, unless it's unchanged since the
+        previous run.
+        """
+        filename = self.article_filename(article)
+        path = self.raw_path(filename)
+
+        old = self.old_manifest.get(filename, {})
+        if old.get("fingerprint") == self.manifest[filename][
+            "fingerprint"
+        ] and os.path.exists(path):
+            return
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            replace_file(path, self.gzip_compress(raw.encode("utf-8")))
+        except EnvironmentError:
+            raise ScraperError("Unable to write the file " + path)
+
+    def write_raw_index(self):
+        """
+        Saves the list of raw API data files for the issue, in reading order,
+        as index.json in the issue's directory within self.raw_dir. And removes
+        the files of any articles that are no longer in the issue.
+        """
+        issue_raw_dir = self.raw_dir + self.issue_date.strftime("%Y-%m-%d") + "/"
+        filenames = [
+            os.path.basename(self.raw_path(self.article_filename(article)))
+            for book in self.contents["books"]
+            for article in book["articles"]
+        ]
+
+        try:
+            os.makedirs(issue_raw_dir, exist_ok=True)
+            replace_file(
+                issue_raw_dir + "index.json", json_dumps(filenames).encode("utf-8")
+            )
+            keep = set(filenames + ["index.json"])
+            for filename in os.listdir(issue_raw_dir):
+                if filename not in keep:
+                    os.remove(issue_raw_dir + filename)
+        except EnvironmentError:
+            raise ScraperError("Unable to save the raw data in " + issue_raw_dir)
+
+    async def fetch_pages_async(self, pages, first_page=None):
+        """
+        Like fetch_pages(), but also overlaps each page's image checks,
+        rendering, and file writing with fetching the following pages.
+
+        Each page's articles are still classified, rendered and added to
+        self.fetched_books in order, so the result is the same. Requests, image
+        checks and file writes are done in a pool of threads, and rendering in
+        another thread (which uses the render pool if there is one).
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        remaining_pages = iter(pages)
+        pending = collections.deque()
+
+        # The previous page's file writes, which happen while the next page is
+        # being rendered.
+        writes = []
+
+        io_executor = ThreadPoolExecutor(max_workers=self.fetch_concurrency + 8)
+        render_executor = ThreadPoolExecutor(max_workers=1)
+
+        def fetch_next_page():
+            "Starts fetching the next page, if there is one."
+            kwargs = next(remaining_pages, None)
+            if kwargs is not None:
+                pending.append(
+                    loop.run_in_executor(
+                        io_executor,
+                        functools.partial(self.fetch_page_of_articles, **kwargs),
+                    )
+                )
+
+        async def process_page(fetched_articles):
+            nonlocal writes
+            articles_to_save = self.classify_articles(fetched_articles)
+            articles = [article for article, raw in articles_to_save]
+
+            if self.check_images:
+                urls = self.unchecked_image_urls(articles)
+                results = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(io_executor, self.image_exists, url)
+                        for url in urls
+                    )
+                )
+                self.image_checks.update(zip(urls, results))
+                self.remove_missing_images(articles)
+
+            if self.mirror_images:
+                await loop.run_in_executor(
+                    io_executor, self.mirror_article_images, articles
+                )
+
+            rendered = await loop.run_in_executor(
+                render_executor, lambda: list(self.rendered_articles(articles))
+            )
+
+            await asyncio.gather(*writes)
+            writes = [
+                loop.run_in_executor(
+                    io_executor, self.write_file, article["file"], html
+                )
+                for article, html in rendered
+            ]
+
+            self.add_to_books(articles_to_save)
+
+        try:
+            for _ in range(self.fetch_concurrency):
+                fetch_next_page()
+
+            if first_page is not None:
+                await process_page(first_page["results"])
+                del first_page
+
+            while pending:
+                fetched_page = await pending.popleft()
+                fetch_next_page()
+
+                if fetched_page is False:
+                    raise ScraperError("Error when fetching data from API.")
+
+                await process_page(fetched_page["results"])
+
+            await asyncio.gather(*writes)
+        finally:
+            # Wait for anything still running, eg if there was an error.
+            await asyncio.gather(*pending, *writes, return_exceptions=True)
+            io_executor.shutdown()
+            render_executor.shutdown()
+
+    def fetch_changed_articles(self):
+        """
+        Asks the API for only the IDs and lastModified times of all the
+        articles in the issue. Articles that are unchanged since the previous
+        run, and were rendered with the same template_version(), are copied
+        from self.old_manifest into self.fetched_books. All the
+        data is then fetched for any new or changed articles, several at a time.
+
+        Returns False if the IDs couldn't be fetched, or True otherwise.
+        """
+        probed = {}
+        page = 1
+        total_pages = 1
+
+        while page <= total_pages:
+            fetched_page = self.fetch_page_of_articles(
+                page=page, page_size=self.page_size, probe=True
+            )
+            if fetched_page is False:
+                self.message("Couldn't check for changes; fetching all articles.")
+                return False
+            for article in fetched_page["results"]:
+                probed[article["id"]] = article.get("fields", {}).get("lastModified")
+            total_pages = fetched_page.get("pages", 1)
+            page += 1
+
+        old_articles = {
+            data["id"]: (filename, data)
+            for filename, data in self.old_manifest.items()
+            if "entry" in data
+        }
+        ids_to_fetch = []
+
+        for article_id, last_modified in probed.items():
+            filename, data = old_articles.get(article_id, (None, None))
+
+            if (
+                data is None
+                or last_modified is None
+                or data["lastModified"] != last_modified
+                or data.get("template") != self.template_version
+                or self.saved_file(filename) is None
+                or (self.save_raw and not os.path.exists(self.raw_path(filename)))
+                or (self.search_index and "terms" not in data)
+                or ("images" in data) != self.mirror_images
+            ):
+                ids_to_fetch.append(article_id)
+                continue
+
+            self.manifest[filename] = data
+            self.counts["unchanged"] += 1
+
+            book = data["book"]
+            if book["id"] not in self.fetched_books:
+                self.fetched_books[book["id"]] = {"meta": book, "articles": []}
+            # A copy, because write_article_packs() will add its own "pack".
+            entry = dict(data["entry"])
+            entry.pop("pack", None)
+            self.fetched_books[book["id"]]["articles"].append(entry)
+
+            if data["entry"]["words"] > self.contents["meta"]["max_words"]:
+                self.contents["meta"]["max_words"] = data["entry"]["words"]
+
+        self.message(
+            "%s of %s articles are new or changed." % (len(ids_to_fetch), len(probed))
+        )
+
+        batch_size = 50
+        self.fetch_pages(
+            [
+                {"ids": ids_to_fetch[n : n + batch_size]}
+                for n in range(0, len(ids_to_fetch), batch_size)
+            ]
+        )
+
+        # Put the books, and their articles, back in the order the API listed
+        # them, as they would be after fetching all of them.
+        positions = {article_id: n for n, article_id in enumerate(probed)}
+        for book in self.fetched_books.values():
+            book["articles"].sort(key=lambda k: positions.get(k["id"], len(positions)))
+        self.fetched_books = dict(
+            sorted(
+                self.fetched_books.items(),
+                key=lambda item: positions.get(
+                    item[1]["articles"][0]["id"], len(positions)
+                ),
+            )
+        )
+
+        return True
+
+    def process_articles(self, fetched_articles):
+        """
+        Given a list of article dicts from the API, saves each one's HTML to
+        disk and puts the data returned by make_contents_entry() into its book
+        in self.fetched_books.
+        If self.keep_full_articles is True, all of the data is also saved in
+        self.spool.
+        """
+        articles_to_save = self.classify_articles(fetched_articles)
+
+        if self.check_images:
+            self.check_article_images([article for article, raw in articles_to_save])
+
+        if self.mirror_images:
+            self.mirror_article_images([article for article, raw in articles_to_save])
+
+        # Save files and store their filenames:
+        self.save_articles_html([article for article, raw in articles_to_save])
+
+        self.add_to_books(articles_to_save)
+
+    def classify_articles(self, fetched_articles):
+        """
+        Given a list of article dicts from the API, puts the tags we need in
+        each article, and skips any we can't put into a book.
+        Returns a list of tuples of each article, and its data as it came from
+        the API if we're saving that.
+        """
+        articles_to_save = []
+
+        for article in fetched_articles:
+            if self.save_raw and not self.rerendering:
+                raw = json_dumps(article)
+            else:
+                raw = None
+
+            # We'll put any tags we want to keep in article itself:
+            tags = article["tags"]
+            del article["tags"]
+
+            if len(tags) == 0:
+                self.message(
+                    "* %s has no tags; unable to put into section." % article["id"]
+                )
                 continue
 
             if "newspaperPageNumber" not in article["fields"]:
@@ -376,12 +2029,6 @@ class GuardianGrabber:
 
             article["tone"] = self.get_tone(tags)
 
-            if book["id"] not in self.fetched_books:
-                self.fetched_books[book["id"]] = {
-                    "meta": book,
-                    "articles": [],
-                }
-
             # Make page number into an int.
             article["fields"]["newspaperPageNumber"] = int(
                 article["fields"]["newspaperPageNumber"]
@@ -393,17 +2040,34 @@ class GuardianGrabber:
             if words > self.contents["meta"]["max_words"]:
                 self.contents["meta"]["max_words"] = words
 
-            # Save file and store its filename:
-            article["file"] = self.save_article_html(article)
+            articles_to_save.append((article, raw))
+
+        return articles_to_save
+
+    def add_to_books(self, articles_to_save):
+        """
+        Given a list of tuples from classify_articles(), once the articles have
+        been saved, puts each one into its book in self.fetched_books.
+        """
+        if self.save_raw and not self.rerendering:
+            for article, raw in articles_to_save:
+                self.write_raw_article(article, raw)
+
+        for article, raw in articles_to_save:
+            book = article["newspaperBook"]
+
+            if book["id"] not in self.fetched_books:
+                self.fetched_books[book["id"]] = {
+                    "meta": book if self.keep_full_articles else compact_book(book),
+                    "articles": [],
+                }
 
-            self.fetched_books[book["id"]]["articles"].append(article)
+            if self.keep_full_articles:
+                self.spool_article(article)
 
-        if len(fetched_articles) >= max_articles_to_fetch:
-            # We fetched the maximum, so there might be another page.
-            # Call this same method again:
-            # Pause, be nice.
-            time.sleep(1)
-            self.fetch_articles(page=page + 1)
+            self.fetched_books[book["id"]]["articles"].append(
+                self.make_contents_entry(article)
+            )
 
     def sort_articles(self):
         """Puts data from self.fetched_books in the correct order and format,
@@ -484,44 +2148,503 @@ class GuardianGrabber:
 
         # Sort the articles within each book:
         for book in self.contents["books"]:
-            book["articles"] = sorted(
-                book["articles"], key=lambda k: k["fields"]["newspaperPageNumber"]
+            book["articles"] = sorted(book["articles"], key=lambda k: k["page"])
+
+    def write_article_packs(self):
+        """
+        Saves the HTML of every self.pack_size articles, in reading order, in
+        'pack' files, like pack-1.html, pack-2.html, etc.
+
+        Each article's HTML is preceded by a comment like <!--pack:abc.html-->,
+        giving its file's name.
+
+        The list of pack filenames is put in self.contents['meta']['packs'] and
+        each article gets a 'pack' of [pack index, offset, length]. The index is
+        0-based, and the offset and length are the bytes of the article's HTML
+        (including its comment) in the pack, for use in Range requests.
+        """
+        articles = [
+            article for book in self.contents["books"] for article in book["articles"]
+        ]
+
+        self.contents["meta"]["packs"] = []
+
+        for first in range(0, len(articles), self.pack_size):
+            pack_index = len(self.contents["meta"]["packs"])
+            filename = "pack-%s.html" % (pack_index + 1)
+            fragments = []
+            offset = 0
+
+            for article in articles[first : first + self.pack_size]:
+                try:
+                    with open(self.output_dir + article["file"], "rb") as fp:
+                        html = fp.read()
+                except EnvironmentError:
+                    raise ScraperError(
+                        "Unable to read the file " + self.output_dir + article["file"]
+                    )
+                fragment = ("<!--pack:%s-->\n" % article["file"]).encode("utf-8") + html
+                article["pack"] = [pack_index, offset, len(fragment)]
+                fragments.append(fragment)
+                offset += len(fragment)
+
+            self.write_file(filename, b"".join(fragments).decode("utf-8"))
+            self.contents["meta"]["packs"].append(filename)
+
+        # Remove packs left over from a previous run with more articles.
+        for filename in os.listdir(self.output_dir):
+            match = re.match(r"(pack-\d+\.html)(\.gz|\.br)?$", filename)
+            if match and match.group(1) not in self.contents["meta"]["packs"]:
+                os.remove(self.output_dir + filename)
+
+        self.message(
+            "Saved %s packs of articles." % len(self.contents["meta"]["packs"])
+        )
+
+    def write_search_index(self):
+        """
+        Saves search.json, an index of the terms in every article, from their
+        'terms' in self.manifest. Like:
+
+        {
+            'articles': 123,
+            'terms': {
+                'spain': [0, 3, 1],
+                ...
+            }
+        }
+
+        Each term's list is the positions of the articles it's in, counting
+        from 0 in reading order through all of self.contents['books'] (so must
+        be called after sort_articles()). To keep it small, each position is
+        stored as the difference from the one before it.
+        """
+        postings = collections.defaultdict(list)
+        position = -1
+
+        for book in self.contents["books"]:
+            for entry in book["articles"]:
+                position += 1
+                for term in self.manifest[self.article_filename(entry)].get(
+                    "terms", []
+                ):
+                    postings[term].append(position)
+
+        terms = {}
+        for term in sorted(postings):
+            positions = postings[term]
+            terms[term] = [positions[0]] + [
+                b - a for a, b in zip(positions, positions[1:])
+            ]
+
+        self.write_file(
+            "search.json", json_dumps({"articles": position + 1, "terms": terms})
+        )
+
+    def compact_contents(self):
+        """
+        Returns a version of self.contents with only the data the reader needs
+        to navigate the issue. Like:
+
+        {
+            'meta': {'max_words': 2340, 'paper_name': 'observer'},
+            'books': [
+                {
+                    'meta': {'id': '', 'webTitle': 'Main section', 'webUrl': ''},
+                    'articles': [{...}, {...}, ...]
+                },
+                ...
+            ]
+        }
+
+        Each article being as returned by make_contents_entry().
+        If self.keep_full_articles is False, self.contents is already like
+        this.
+        """
+        if not self.keep_full_articles:
+            return self.contents
+
+        return {
+            "meta": self.contents["meta"],
+            "books": [
+                {"meta": compact_book(book["meta"]), "articles": book["articles"]}
+                for book in self.contents["books"]
+            ],
+        }
+
+    def write_contents_deltas(self):
+        """
+        Sets the version in self.contents['meta'], and saves a delta-K.json for
+        each of the previous self.contents_deltas versions of the contents,
+        describing what's changed between version K and this version. See
+        contents_delta().
+
+        The version only goes up if the contents have changed since the
+        previous run. A summary of the contents at each version, from
+        contents_snapshot(), is kept in contents-history.json. There's also a
+        delta-K.json for this version, K, with nothing in it, so that a reader
+        with the latest version can fetch that to find there's nothing new.
+        Deltas from older versions are deleted.
+        """
+        try:
+            with open(self.issue_archive_dir + "contents-history.json", "rb") as fp:
+                snapshots = json_loads(fp.read())["snapshots"]
+        except FileNotFoundError:
+            snapshots = []
+        except (EnvironmentError, ValueError, KeyError):
+            self.message("Couldn't read contents-history.json; starting again.")
+            snapshots = []
+
+        snapshot = self.contents_snapshot()
+
+        if (
+            snapshots
+            and snapshots[-1]["books"] == snapshot["books"]
+            and snapshots[-1]["articles"] == snapshot["articles"]
+        ):
+            snapshot["version"] = snapshots[-1]["version"]
+            snapshots[-1] = snapshot
+        else:
+            snapshot["version"] = snapshots[-1]["version"] + 1 if snapshots else 1
+            snapshots.append(snapshot)
+            snapshots = snapshots[-(self.contents_deltas + 1) :]
+
+        self.contents["meta"]["version"] = snapshot["version"]
+
+        filenames = set()
+        for old_snapshot in snapshots:
+            filename = "delta-%s.json" % old_snapshot["version"]
+            self.write_file(
+                filename, json_dumps(self.contents_delta(old_snapshot, snapshot))
+            )
+            filenames.add(filename)
+
+        for filename in os.listdir(self.output_dir):
+            match = re.match(r"(delta-\d+\.json)(\.gz|\.br)?$", filename)
+            if match and match.group(1) not in filenames:
+                os.remove(self.output_dir + filename)
+
+        self.write_file("contents-history.json", json_dumps({"snapshots": snapshots}))
+
+    def contents_snapshot(self):
+        """
+        Returns a summary of self.contents, from which contents_delta() can
+        work out what's changed between two versions. Like:
+
+        {
+            'books': [
+                ['theguardian/mainsection', '1a2b3c...', ['0a1b2c...html', ...]],
+                ...
+            ],
+            'articles': {
+                '0a1b2c...html': ['4d5e6f...', '9f8e7d...'],
+                ...
+            }
+        }
+
+        Each book is its ID, a hash of its meta, and its articles' filenames
+        in order. Each article's filename maps to hashes of its entry in the
+        contents and of its fingerprint in self.manifest.
+        """
+
+        def short_hash(data):
+            data = json.dumps(data, sort_keys=True).encode("utf-8")
+            return hashlib.md5(data).hexdigest()[:12]
+
+        snapshot = {"books": [], "articles": {}}
+
+        for book in self.contents["books"]:
+            snapshot["books"].append(
+                [
+                    book["meta"]["id"],
+                    short_hash(compact_book(book["meta"])),
+                    [entry["file"] for entry in book["articles"]],
+                ]
+            )
+            for entry in book["articles"]:
+                snapshot["articles"][entry["file"]] = [
+                    short_hash(entry),
+                    self.manifest[self.article_filename(entry)]["fingerprint"][:12],
+                ]
+
+        return snapshot
+
+    def contents_delta(self, old, new):
+        """
+        Given two snapshots from contents_snapshot(), returns what's changed
+        between them, as saved in delta-K.json files. Like:
+
+        {
+            'from': 12,
+            'to': 14,
+            'meta': {'max_words': 2340, 'paper_name': 'guardian', 'version': 14},
+            'books': [
+                {'id': 'theguardian/mainsection', 'articles': ['0a1b2c...html']},
+                {'id': 'theguardian/g2'},
+                {'id': 'theguardian/sport', 'meta': {...}, 'articles': [...]},
+            ],
+            'articles': {
+                '0a1b2c...html': {...},
+            },
+            'changed': ['3c4d5e...html'],
+            'removed': ['6f7a8b...html'],
+        }
+
+        'books' is only there if any book, or the order of books or of their
+        articles, has changed. Then it lists every book in order, with its
+        'meta' if that's new or changed, and the filenames of its 'articles'
+        in order if they've changed.
+        'articles' has the contents entry, from make_contents_entry(), of every
+        article that's new or whose entry has changed.
+        'changed' lists the articles that were in the old version but whose
+        HTML files have changed since, and 'removed' those that are no longer
+        in the issue.
+        """
+        old_books = {
+            book_id: (meta_hash, files) for book_id, meta_hash, files in old["books"]
+        }
+        book_metas = {
+            book["meta"]["id"]: compact_book(book["meta"])
+            for book in self.contents["books"]
+        }
+        entries = {
+            entry["file"]: entry
+            for book in self.contents["books"]
+            for entry in book["articles"]
+        }
+
+        delta = {
+            "from": old["version"],
+            "to": new["version"],
+            "meta": self.contents["meta"],
+        }
+
+        if old["books"] != new["books"]:
+            delta["books"] = []
+            for book_id, meta_hash, files in new["books"]:
+                book = {"id": book_id}
+                old_meta_hash, old_files = old_books.get(book_id, (None, None))
+                if meta_hash != old_meta_hash:
+                    book["meta"] = book_metas[book_id]
+                if files != old_files:
+                    book["articles"] = files
+                delta["books"].append(book)
+
+        delta["articles"] = {
+            filename: entries[filename]
+            for filename, (entry_hash, fingerprint) in new["articles"].items()
+            if old["articles"].get(filename, [None])[0] != entry_hash
+        }
+        delta["changed"] = sorted(
+            filename
+            for filename, (entry_hash, fingerprint) in new["articles"].items()
+            if filename in old["articles"]
+            and old["articles"][filename][1] != fingerprint
+        )
+        delta["removed"] = sorted(set(old["articles"]) - set(new["articles"]))
+
+        return delta
+
+    def spool_article(self, article):
+        "Adds the JSON of all of an article's data to self.spool."
+        if self.spool is None:
+            self.spool = tempfile.TemporaryFile(dir=self.archive_dir)
+
+        data = json_dumps(article).encode("utf-8")
+        offset = self.spool.seek(0, io.SEEK_END)
+        self.spool.write(data)
+        self.spooled[article["file"]] = (offset, len(data))
+
+    def spooled_article(self, entry):
+        """
+        Returns the JSON of all of the data for the article described by entry,
+        a dict from make_contents_entry(), from self.spool.
+        """
+        offset, length = self.spooled[entry["file"]]
+        self.spool.seek(offset)
+        data = self.spool.read(length).decode("utf-8")
+
+        if "pack" in entry:
+            # Added by write_article_packs() after the article was spooled.
+            article = json_loads(data)
+            article["pack"] = entry["pack"]
+            data = json_dumps(article)
+
+        return data
+
+    def full_book_chunks(self, book):
+        """
+        Yields the JSON of one of self.contents['books'], with all of each
+        article's data, a piece at a time.
+        """
+        yield '{"meta":%s,"articles":[' % json_dumps(book["meta"])
+        for n, entry in enumerate(book["articles"]):
+            yield ("," if n else "") + self.spooled_article(entry)
+        yield "]}"
+
+    def full_contents_chunks(self):
+        """
+        Yields the JSON of self.contents, with all of each article's data, a
+        piece at a time. The same as json_dumps() would return if all of the
+        data were in self.contents.
+        """
+        yield '{"meta":%s,"books":[' % json_dumps(self.contents["meta"])
+        for n, book in enumerate(self.contents["books"]):
+            if n:
+                yield ","
+            yield from self.full_book_chunks(book)
+        yield "]}"
+
+    def write_contents_shards(self):
+        """
+        Saves a contents file for each book, in the same format as
+        contents.json, and a contents-index.json that lists them in order, like:
+
+        {
+            'meta': {'max_words': 2340, 'paper_name': 'guardian'},
+            'books': [
+                {
+                    'meta': {'id': 'theguardian/mainsection', ...},
+                    'file': 'contents-theguardian-mainsection.json',
+                    'words': [374, 1022, ...],
+                },
+                ...
+            ]
+        }
+
+        'words' is the wordcount of each of the book's articles, in order, so
+        that the reader can lay out the whole issue before loading each book.
+        """
+        index = {"meta": self.contents["meta"], "books": []}
+        # The other contents files, which aren't shards.
+        filenames = {
+            "contents-full.json",
+            "contents-history.json",
+            "contents-index.json",
+        }
+
+        for book in self.contents["books"]:
+            filename = "contents-%s.json" % re.sub(
+                r"[^a-z0-9]+", "-", book["meta"]["id"].lower()
+            )
+            filenames.add(filename)
+            if self.contents_format == "full":
+                self.write_file_chunks(filename, self.full_book_chunks(book))
+            else:
+                self.write_file(
+                    filename,
+                    json_dumps(
+                        {
+                            "meta": compact_book(book["meta"]),
+                            "articles": book["articles"],
+                        }
+                    ),
+                )
+
+            index["books"].append(
+                {
+                    "meta": compact_book(book["meta"]),
+                    "file": filename,
+                    "words": [article["words"] for article in book["articles"]],
+                }
             )
 
-    def fetch_page_of_articles(self, page=1, page_size=200):
+        self.write_file("contents-index.json", json_dumps(index))
+
+        # Remove shards of books that were in the issue on a previous run.
+        for filename in os.listdir(self.output_dir):
+            match = re.match(r"(contents-[a-z0-9-]+\.json)(\.gz|\.br)?$", filename)
+            if match and match.group(1) not in filenames:
+                os.remove(self.output_dir + filename)
+
+    def make_contents_entry(self, article):
+        """
+        Given an article's full data, returns the small dict used to describe it
+        in the compact contents.json. Like:
+
+        {
+            'id': 'world/gallery/2010/jul/07/spain-spain',
+            'file': '0a1b2c...html',
+            'webUrl': 'https://www.theguardian.com/world/...',
+            'headline': 'Article headline',
+            'page': 34,
+            'words': 374,
+            'tone': 'news',
+            'section': 'International',  # If it has a newspaper-book-section
+            'thumbnail': 'https://...',  # If it has a thumbnail
+            'pack': [0, 12345, 6789],  # If it's in a pack of articles
+        }
+        """
+        fields = article["fields"]
+
+        entry = {
+            "id": article["id"],
+            "file": article["file"],
+            "webUrl": article.get("webUrl"),
+            "headline": fields.get("headline", article.get("webTitle")),
+            "page": fields["newspaperPageNumber"],
+            "words": fields["wordcount"],
+            "tone": article["tone"],
+        }
+
+        if article.get("newspaperBookSection"):
+            entry["section"] = article["newspaperBookSection"]["webTitle"]
+
+        if "thumbnail" in fields:
+            entry["thumbnail"] = fields["thumbnail"]
+
+        if "pack" in article:
+            entry["pack"] = article["pack"]
+
+        return entry
+
+    def fetch_page_of_articles(
+        self, page=1, page_size=200, probe=False, ids=None, lazy=False
+    ):
         """Fetches a single set of articles from today's issue.
-        Returns a list of dicts, each dict an article's data.
+        Returns the API's response dict, which includes 'pages' (the total
+        number of pages) and 'results' (a list of dicts, each dict an article's
+        data).
         Or False if there was an error.
+        probe and ids are as for api_args().
+        If self.stream_decode is True, the response is decoded as it arrives,
+        with decode_results(). Then if lazy is True, 'results' is an iterator
+        that returns each article as soon as it's arrived, so the caller can
+        start on them before the rest have. See streamed_results().
         """
+        stream = self.stream_decode and not probe
 
-        api_url = "http://content.guardianapis.com/search"
+        url_args = self.api_args(page=page, page_size=page_size, probe=probe, ids=ids)
 
-        url_args = {
-            "page": page,
-            "page-size": page_size,
-            "api-key": self.guardian_api_key,
-            "format": "json",
-            "show-fields": (
-                "body,byline,headline,newspaperPageNumber,publication,shortUrl,"
-                "standfirst,starRating,thumbnail,wordcount"
-            ),
-            "show-elements": "all",
-            "show-tags": "contributor,newspaper-book,newspaper-book-section,tone",
-            # Get the articles from today's edition:
-            "use-date": "newspaper-edition",
-            "from-date": self.issue_date.strftime("%Y-%m-%d"),
-            "to-date": self.issue_date.strftime("%Y-%m-%d"),
-            # The most we can fetch per page:
-        }
+        if ids:
+            self.message("Fetching %s articles by ID." % len(ids))
+        else:
+            self.message("Fetching page %s of up to %s articles." % (page, page_size))
 
-        self.message("Fetching page %s of up to %s articles." % (page, page_size))
+        import requests
 
         error_message = ""
         response = None
 
         try:
-            response = requests.get(api_url, params=url_args, timeout=20)
+            with self.timed("fetch"):
+                response = self.request(
+                    self.api_url, params=url_args, timeout=20, api=True, stream=stream
+                )
             response.raise_for_status()
+
+            if stream:
+                with self.timed("decode"):
+                    results = decode_results(response.iter_content(STREAM_CHUNK_SIZE))
+                    data = next(results)
+                    if "results" in data.get("response", {}):
+                        if lazy:
+                            data["response"]["results"] = self.streamed_results(results)
+                        else:
+                            data["response"]["results"] = list(results)
+            else:
+                with self.timed("decode"):
+                    data = self.decode_json(response.content)
         except requests.exceptions.HTTPError:
             error_message = "HTTP Error: %s" % response.status_code
         except requests.exceptions.ConnectionError as e:
@@ -533,10 +2656,11 @@ class GuardianGrabber:
         except requests.exceptions.RequestException as e:
             # Catches any other requests exceptions.
             error_message = "RequestException: %s" % e
+        except ValueError as e:
+            error_message = "The returned data was not valid JSON: %s" % e
 
         if error_message == "":
             # All good so far. Check the returned data.
-            data = response.json()
             if (
                 "response" in data
                 and "status" in data["response"]
@@ -544,22 +2668,244 @@ class GuardianGrabber:
             ):
                 if data["response"]["status"] != "ok":
                     error_message = (
-                        "The API returned the status '%s'" % data["response"]["ok"]
+                        "The API returned the status '%s'" % data["response"]["status"]
                     )
             else:
                 error_message = "The returned data was not the expected format."
 
         if error_message == "":
             # Still OK!
-            articles = data["response"]["results"]
-            self.message("Fetched %s articles." % len(articles))
-            return articles
+            if isinstance(data["response"]["results"], list):
+                self.message(
+                    "Fetched %s articles from page %s."
+                    % (len(data["response"]["results"]), page)
+                )
+            return data["response"]
         else:
             self.message("ERROR: %s" % error_message)
             return False
 
-    def get_tone(self, tags):
-        """Look through all the tags (a list of dicts) we've got for an article
+    def streamed_results(self, results):
+        """
+        Yields each article from results, an iterator from decode_results(),
+        adding the time spent waiting for and decoding it to the 'decode' stage.
+        Raises ScraperError if the rest of the page can't be fetched or decoded.
+        """
+        import requests
+
+        while True:
+            try:
+                with self.timed("decode"):
+                    article = next(results)
+            except StopIteration:
+                return
+            except (requests.exceptions.RequestException, ValueError) as e:
+                raise ScraperError("Error when fetching data from API: %s" % e)
+            yield article
+
+    def api_args(self, page=1, page_size=200, probe=False, ids=None):
+        """
+        Returns the dict of query arguments used to fetch a page of articles in
+        this issue from the API.
+        If probe is True, only each article's ID and lastModified are fetched.
+        If ids is a list of article IDs, all of those articles are fetched,
+        whatever page and page_size are.
+        """
+        if probe:
+            return {
+                "page": page,
+                "page-size": page_size,
+                "api-key": self.guardian_api_key,
+                "format": "json",
+                "show-fields": "lastModified",
+                "use-date": "newspaper-edition",
+                "from-date": self.issue_date.strftime("%Y-%m-%d"),
+                "to-date": self.issue_date.strftime("%Y-%m-%d"),
+            }
+
+        args = {
+            "page": page,
+            "page-size": page_size,
+            "api-key": self.guardian_api_key,
+            "format": "json",
+            "show-fields": (
+                "body,byline,headline,lastModified,newspaperPageNumber,publication,"
+                "shortUrl,standfirst,starRating,thumbnail,wordcount"
+            ),
+            "show-elements": "all",
+            "show-tags": "contributor,newspaper-book,newspaper-book-section,tone",
+            # Get the articles from today's edition:
+            "use-date": "newspaper-edition",
+            "from-date": self.issue_date.strftime("%Y-%m-%d"),
+            "to-date": self.issue_date.strftime("%Y-%m-%d"),
+        }
+
+        if ids:
+            args["ids"] = ",".join(ids)
+            args["page"] = 1
+            args["page-size"] = len(ids)
+            for key in ("use-date", "from-date", "to-date"):
+                del args[key]
+
+        return args
+
+    def decode_json(self, content):
+        "Returns the data from the JSON bytes or string content."
+        return json_loads(content)
+
+    def make_session(self):
+        """
+        Returns a requests Session with a connection pool big enough for all of
+        the pages we fetch at once.
+        """
+        import requests
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_maxsize=max(10, self.fetch_concurrency)
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def request(self, url, params=None, timeout=20, api=False, stream=False):
+        """
+        Makes a GET request using self.session and returns the Response.
+        If stream is True, the body isn't read until the caller reads it, eg
+        with Response.iter_content().
+
+        Requests that time out, can't connect, or get a 429 or 5xx response are
+        retried up to self.max_retries times, waiting longer each time (or as
+        long as any Retry-After header asks).
+        If api is True this is a request to the Content API, so every attempt
+        waits for wait_for_request_slot() and is counted in self.api_calls.
+
+        Raises a requests.exceptions.RequestException if there was still no
+        response after the final attempt. Otherwise it's up to the caller to
+        check the final response's status.
+        """
+        import requests
+
+        attempt = 0
+
+        while True:
+            if api:
+                self.wait_for_request_slot()
+                self.count_api_call()
+
+            response = None
+            error = None
+            started = time.monotonic()
+
+            try:
+                response = self.session.get(
+                    url, params=params, timeout=timeout, stream=stream
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                error = e
+
+            if response is None:
+                size = 0
+            elif stream:
+                # We don't have the body yet. 0 if the server didn't say.
+                size = int(response.headers.get("Content-Length", 0))
+            else:
+                size = len(response.content)
+
+            self.request_log.append(
+                {
+                    "url": url,
+                    "status": None if response is None else response.status_code,
+                    "seconds": round(time.monotonic() - started, 3),
+                    "bytes": size,
+                    "attempt": attempt,
+                    "page": (params or {}).get("page"),
+                }
+            )
+
+            if response is not None and response.status_code < 500:
+                if response.status_code != 429:
+                    return response
+
+            delay = self.retry_delay(attempt, response)
+
+            if attempt >= self.max_retries or delay is None:
+                if response is None:
+                    raise error
+                return response
+
+            self.message(
+                "Retrying %s in %.1f seconds (%s)."
+                % (url, delay, error or "HTTP %s" % response.status_code)
+            )
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def retry_delay(self, attempt, response=None):
+        """
+        How many seconds to wait before retrying a request that's failed
+        attempt + 1 times.
+        If the response has a Retry-After header we use that, or return None if
+        it asks us to wait longer than self.retry_backoff_max.
+        Otherwise it's exponential backoff, with some jitter so that
+        concurrent requests don't all retry at the same moment.
+        """
+        retry_after = None
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                # It's an HTTP date instead.
+                try:
+                    retry_date = email.utils.parsedate_to_datetime(retry_after)
+                    delay = (
+                        retry_date - datetime.datetime.now(datetime.timezone.utc)
+                    ).total_seconds()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                delay = max(0, delay)
+                return delay if delay <= self.retry_backoff_max else None
+
+        delay = min(self.retry_backoff_max, self.retry_backoff * (2**attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def count_api_call(self):
+        "Adds one to the number of API requests made today, UK time."
+        today = self.london_now().strftime("%Y-%m-%d")
+        with self.request_lock:
+            self.api_calls[today] = self.api_calls.get(today, 0) + 1
+
+    def london_now(self):
+        "Returns the current datetime in the UK, where the papers are published."
+        import pytz
+
+        return datetime.datetime.now(pytz.timezone("Europe/London"))
+
+    def wait_for_request_slot(self):
+        """
+        Blocks until at least self.fetch_interval seconds have passed since the
+        previous API request was started. Pause, be nice.
+        Can be called from several threads at once.
+        """
+        with self.request_lock:
+            wait = (
+                self.last_request_time["last"] + self.fetch_interval - time.monotonic()
+            )
+            if wait > 0:
+                time.sleep(wait)
+            self.last_request_time["last"] = time.monotonic()
+
+    def get_tone(self, tags):
+        """Look through all the tags (a list of dicts) we've got for an article
         and using the 0 or more of type 'tag', assign one tone that will be
         used to give the article a color.
         We use these tones and ignore the others:
@@ -598,38 +2944,865 @@ class GuardianGrabber:
 
         return "default"
 
+    def check_article_images(self, articles):
+        """
+        Makes HEAD requests for the thumbnail and contributor images of each
+        article in the list, several at once, and removes any that are
+        missing from the articles.
+        """
+        urls = self.unchecked_image_urls(articles)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            self.image_checks.update(zip(urls, executor.map(self.image_exists, urls)))
+
+        self.remove_missing_images(articles)
+
+    def unchecked_image_urls(self, articles):
+        """
+        Returns a list of the thumbnail and contributor image URLs of the
+        articles that aren't yet in self.image_checks.
+        """
+        urls = []
+        for article in articles:
+            for url in self.article_image_urls(article):
+                if url not in self.image_checks and url not in urls:
+                    urls.append(url)
+        return urls
+
+    def article_image_urls(self, article):
+        "Returns a list of the article's thumbnail and contributor image URLs."
+        return [
+            url
+            for url in (
+                article["fields"].get("thumbnail"),
+                (article["contributor"] or {}).get("bylineImageUrl"),
+            )
+            if url
+        ]
+
+    def image_exists(self, url):
+        """
+        Returns False if a HEAD request for url gets a 4xx or 5xx response.
+        If there's no response at all we assume the image is fine.
+        """
+        import requests
+
+        try:
+            response = self.session.head(url, timeout=10, allow_redirects=True)
+        except requests.exceptions.RequestException:
+            return True
+        return response.status_code < 400
+
+    def remove_missing_images(self, articles):
+        """
+        Removes the thumbnail and contributor image URLs from the articles if
+        self.image_checks says they're missing.
+        """
+        for article in articles:
+            if self.image_checks.get(article["fields"].get("thumbnail")) is False:
+                self.message("* %s has a missing thumbnail." % article["id"])
+                del article["fields"]["thumbnail"]
+
+            contributor = article["contributor"] or {}
+            if self.image_checks.get(contributor.get("bylineImageUrl")) is False:
+                self.message("* %s has a missing contributor image." % article["id"])
+                del contributor["bylineImageUrl"]
+
+    def mirror_article_images(self, articles):
+        """
+        Downloads the thumbnail and contributor images of each article in the
+        list into self.images_dir, several at once, unless they're already
+        there. Then sets each article's 'images' to a dict of each image's URL
+        and mirrored_image() of our copy, for the template. Images that can't
+        be downloaded are left out, so the originals are used.
+        """
+        with self.timed("images"):
+            if self.image_files is None:
+                self.image_files = self.saved_image_files()
+
+            urls = []
+            for article in articles:
+                for url in self.article_image_urls(article):
+                    if image_name(url) not in self.image_files and url not in urls:
+                        urls.append(url)
+
+            if urls:
+                with ThreadPoolExecutor(max_workers=self.image_workers) as executor:
+                    for url, files in zip(urls, executor.map(self.mirror_image, urls)):
+                        if not files:
+                            self.message("* Unable to download the image %s" % url)
+                        self.image_files[image_name(url)] = files or []
+
+            for article in articles:
+                images = {}
+                for url in self.article_image_urls(article):
+                    files = self.image_files.get(image_name(url))
+                    if files:
+                        images[url] = self.mirrored_image(files)
+                if images:
+                    article["images"] = images
+
+    def saved_image_files(self):
+        """
+        Returns a dict of the name of each image in self.images_dir, from
+        image_name(), and a list of the files it's saved as.
+        """
+        image_files = collections.defaultdict(list)
+        if os.path.isdir(self.images_dir):
+            for filename in sorted(os.listdir(self.images_dir)):
+                if not filename.endswith(".tmp"):
+                    image_files[re.split(r"[-.]", filename, maxsplit=1)[0]].append(
+                        filename
+                    )
+        return dict(image_files)
+
+    def mirror_image(self, url):
+        """
+        Downloads the image at url and saves it in self.images_dir, resized by
+        image_variants(), or as it is if that's not possible.
+        Returns a list of the filenames, or None if it couldn't be downloaded.
+        """
+        import requests
+
+        try:
+            response = self.session.get(url, timeout=10)
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code >= 400:
+            return None
+
+        name = image_name(url)
+        files = [
+            ("%s-%s.%s" % (name, width, extension), data)
+            for width, extension, data in image_variants(
+                response.content, self.image_widths, self.image_quality
+            )
+        ]
+        if not files:
+            content_type = response.headers.get("Content-Type", "").split(";")[0]
+            extension = mimetypes.guess_extension(content_type.strip()) or (
+                os.path.splitext(urllib.parse.urlsplit(url).path)[1]
+            )
+            files = [(name + extension, response.content)]
+
+        try:
+            os.makedirs(self.images_dir, exist_ok=True)
+            for filename, data in files:
+                replace_file(self.images_dir + filename, data)
+        except EnvironmentError:
+            raise ScraperError("Unable to write the image " + self.images_dir + name)
+
+        return [filename for filename, data in files]
+
+    def mirrored_image(self, files):
+        """
+        Given the list of files an image is saved as, returns a dict of the
+        URLs the template should use for it, like:
+        {
+            'src': 'archive/images/0a1b2c...-530.jpg',
+            'srcset': 'archive/images/0a1b2c...-265.jpg 265w, ...',
+            'webp': 'archive/images/0a1b2c...-265.webp 265w, ...',
+            'sizes': '(max-width: 530px) 50vw, 265px',
+        }
+        'srcset', 'webp' and 'sizes' are only there if it was resized. 'sizes'
+        says it's displayed at the smallest of self.image_widths, or half the
+        width of narrower screens, as the CSS does.
+        """
+        variants = {"jpg": [], "webp": []}
+        for filename in files:
+            match = re.fullmatch(r"[0-9a-f]+-(\d+)\.(jpg|webp)", filename)
+            if match:
+                variants[match.group(2)].append(
+                    (int(match.group(1)), self.image_url_prefix + filename)
+                )
+
+        if not variants["jpg"]:
+            return {"src": self.image_url_prefix + files[0]}
+
+        image = {"src": max(variants["jpg"])[1]}
+        for extension, key in (("jpg", "srcset"), ("webp", "webp")):
+            if variants[extension]:
+                image[key] = ", ".join(
+                    "%s %sw" % (url, width)
+                    for width, url in sorted(variants[extension])
+                )
+
+        width = min(self.image_widths)
+        image["sizes"] = "(max-width: %spx) 50vw, %spx" % (width * 2, width)
+        return image
+
+    def remove_unused_images(self):
+        """
+        Deletes the files in self.images_dir of images that neither this run
+        nor the manifest.json of any issue in the archive uses. Files saved
+        within the past day are kept, in case a run for another issue has only
+        just saved them.
+        """
+        used = set()
+        for data in self.manifest.values():
+            used.update(data.get("images", []))
+
+        for name in os.listdir(self.archive_dir):
+            path = self.archive_dir + name + "/manifest.json"
+            if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", name) or not os.path.exists(path):
+                continue
+            try:
+                with open(path, "rb") as fp:
+                    manifest = json_loads(fp.read())
+            except (EnvironmentError, ValueError):
+                self.message("Couldn't read %s; not removing any images." % path)
+                return
+            for data in manifest.values():
+                used.update(data.get("images", []))
+
+        cutoff = time.time() - 24 * 60 * 60
+        removed = 0
+        for name, filenames in self.saved_image_files().items():
+            if name in used:
+                continue
+            for filename in filenames:
+                path = self.images_dir + filename
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except EnvironmentError:
+                    pass
+
+        if removed:
+            self.message("Removed %s unused image files." % removed)
+
+    def save_articles_html(self, articles):
+        """Makes the HTML for each article in a list and saves each to a file.
+        Each article is all the article's data from the API. Its 'file' is set
+        to the filename.
+        Articles unchanged since the previous run, whose files are still there,
+        aren't rendered or saved again. Nor are articles whose HTML is in the
+        render cache, if it's enabled.
+        If there's more than one render worker, the articles are rendered in
+        parallel, but the files are still written in order.
+        """
+        for article, html in self.rendered_articles(articles):
+            self.write_file(article["file"], html)
+
+    def rendered_articles(self, articles):
+        """
+        Adds each article in the list to the manifest, and yields a tuple of
+        each one that needs saving and its HTML, in order.
+        The HTML comes from the render cache if it's enabled and has it, or
+        render_articles() otherwise.
+        """
+        articles_to_save = []
+
+        for article in articles:
+            if self.add_to_manifest(article):
+                articles_to_save.append(article)
+
+        cached = {}
+        if self.render_cache_enabled and not (self.profile or self.rerendering):
+            cached = self.cached_renders(articles_to_save)
+
+        rendered = self.render_articles(
+            [article for article in articles_to_save if article["file"] not in cached]
+        )
+
+        for article in articles_to_save:
+            if article["file"] in cached:
+                html = cached[article["file"]]
+            else:
+                html = next(rendered)
+                if self.render_cache_enabled:
+                    self.cache_render(article, html)
+            if self.hashed_filenames:
+                self.set_hashed_filename(article, html)
+            yield article, html
+
+        if self.render_cache is not None:
+            with self.render_cache_lock:
+                self.render_cache.commit()
+
     def save_article_html(self, article):
         """Makes the HTML for the article and saves it to a file.
         article is all the article's data from the API.
         Returns the filename.
         """
-        html = self.make_article_html(article)
+        self.save_articles_html([article])
+        return article["file"]
 
+    def article_filename(self, article):
+        """
+        Returns the name of the file an article's HTML is saved as. Or, if
+        self.hashed_filenames, its key in the manifest and the name of its raw
+        data; see set_hashed_filename() for its HTML's file.
+        article can also be an entry from contents.json.
+        """
         # There was once an article ID that was 300 characters long, and the maximum
         # filename length is 255. So we gave up on saving the files with nice readable
         # names and instead make a hash of the ID and use that.
-        filename_hash = hashlib.md5(article["id"].encode('utf-8')).hexdigest()
-        filename = "%s.%s" % (filename_hash, "html")
+        filename_hash = hashlib.md5(article["id"].encode("utf-8")).hexdigest()
+        return "%s.%s" % (filename_hash, "html")
+
+    def set_hashed_filename(self, article, html):
+        """
+        Sets the article's 'file', in self.manifest too, to one named by a hash
+        of its HTML, after the hash of its ID from article_filename().
+        """
+        filename = self.article_filename(article)
+        html_hash = hashlib.md5(html.encode("utf-8")).hexdigest()[:12]
+
+        article["file"] = "%s.%s.html" % (filename.rsplit(".", 1)[0], html_hash)
+        self.manifest[filename]["file"] = article["file"]
+        self.manifest[filename]["entry"]["file"] = article["file"]
+
+    def saved_file(self, filename):
+        """
+        Returns the name of the file that the previous run saved the HTML of
+        the article with article_filename() filename as. Or None if it's not
+        there any more, or wasn't named the way this run would name it.
+        """
+        saved = self.old_manifest.get(filename, {}).get("file", filename)
+        if (saved != filename) != self.hashed_filenames:
+            return None
+        if not os.path.exists(self.output_dir + saved):
+            return None
+        return saved
+
+    def add_to_manifest(self, article):
+        """
+        Sets the article's 'file', and records it in self.manifest and
+        self.counts.
+        Returns False if the article is unchanged since the previous run, and
+        that run's file is still there, or True if it needs rendering.
+        Always returns True if self.rerendering.
+        If self.hashed_filenames, an article that needs rendering gets its
+        'file' from set_hashed_filename() once it has been.
+        """
+        filename = self.article_filename(article)
+        fingerprint = self.article_fingerprint(article)
+        old_data = self.old_manifest.get(filename, {})
+
+        saved = None
+        if old_data.get("fingerprint") == fingerprint:
+            saved = self.saved_file(filename)
+        article["file"] = saved or filename
+
+        self.manifest[filename] = {
+            "id": article["id"],
+            "file": article["file"],
+            "lastModified": article["fields"].get("lastModified"),
+            "fingerprint": fingerprint,
+            "template": self.template_version,
+            "book": compact_book(article["newspaperBook"]),
+            "entry": self.make_contents_entry(article),
+        }
+
+        if self.mirror_images:
+            self.manifest[filename]["images"] = sorted(
+                image_name(url) for url in article.get("images", {})
+            )
+
+        if self.search_index:
+            if old_data.get("fingerprint") == fingerprint and "terms" in old_data:
+                self.manifest[filename]["terms"] = old_data["terms"]
+            else:
+                self.manifest[filename]["terms"] = search_terms(article)
+
+        if filename not in self.old_manifest:
+            self.counts["added"] += 1
+        elif saved is not None:
+            self.counts["unchanged"] += 1
+            # When re-rendering, a filter might have changed without
+            # RENDER_VERSION being increased.
+            return self.rerendering
+        else:
+            self.counts["changed"] += 1
+
+        return True
+
+    def render_articles(self, articles):
+        """
+        Returns an iterator of the HTML for each article in the list, in order.
+        How long each one took is added to self.metrics.
+        """
+        if self.profile:
+            results = map(self.render_profiled, articles)
+        elif self.render_workers <= 1 or len(articles) <= 1:
+            results = (render_timed(self.template, article) for article in articles)
+        else:
+            if self.render_pool is None:
+                self.render_pool = self.make_render_pool()
+
+            # The template doesn't use the 'elements', which can be big, so
+            # don't bother sending them to the other processes.
+            results = self.render_pool.map(
+                render_in_worker,
+                (
+                    {k: v for k, v in article.items() if k != "elements"}
+                    for article in articles
+                ),
+                chunksize=8,
+            )
+
+        for article, (html, wall, cpu, filters) in zip(articles, results):
+            self.add_timing("render", wall, cpu)
+            self.metrics["articles"].append(
+                {
+                    "id": article["id"],
+                    "file": article["file"],
+                    "wall": wall,
+                    "cpu": cpu,
+                    "filters": filters,
+                }
+            )
+            yield html
+
+    def make_render_pool(self):
+        "Returns a ProcessPoolExecutor of render_workers processes."
+        return ProcessPoolExecutor(
+            max_workers=self.render_workers,
+            initializer=init_render_worker,
+            initargs=(self.compiled_templates_dir, self.template_version),
+        )
+
+    def render_profiled(self, article):
+        """
+        Renders an article in this process with cProfile running, keeping the
+        profiles of the self.profile_articles slowest articles in
+        self.profiles.
+        Returns the same as render_timed().
+        """
+        profiler = cProfile.Profile()
+        result = profiler.runcall(render_timed, self.template, article)
+
+        if self.profile_articles > 0:
+            item = (result[1], article["file"], profiler)
+            if len(self.profiles) < self.profile_articles:
+                heapq.heappush(self.profiles, item)
+            else:
+                heapq.heappushpop(self.profiles, item)
+
+        return result
+
+    def close(self):
+        """
+        Shuts down the render pool, if there is one, the render cache, and the
+        HTTP session.
+        """
+        if self.render_pool is not None:
+            self.render_pool.shutdown()
+            self.render_pool = None
+        self.close_render_cache()
+        if self._session is not None:
+            self._session.close()
+
+    def open_render_cache(self):
+        "Opens self.render_cache, creating the database if necessary."
+        try:
+            # It's only used by one thread at a time, but with --async that's
+            # not always the main thread.
+            self.render_cache = sqlite3.connect(
+                self.render_cache_file, check_same_thread=False
+            )
+            self.render_cache.execute(
+                "CREATE TABLE IF NOT EXISTS renders ("
+                "fingerprint TEXT PRIMARY KEY, html BLOB, size INTEGER, used REAL)"
+            )
+            self.render_cache.execute(
+                "CREATE INDEX IF NOT EXISTS renders_used ON renders (used)"
+            )
+        except sqlite3.Error as e:
+            raise ScraperError(
+                "Can't open render cache %s: %s" % (self.render_cache_file, e)
+            )
+
+    def close_render_cache(self):
+        "Saves and closes self.render_cache, if it's open."
+        if self.render_cache is not None:
+            self.render_cache.commit()
+            self.render_cache.close()
+            self.render_cache = None
+
+    def cached_renders(self, articles):
+        """
+        Returns a dict of the HTML in the render cache for any of the list of
+        articles, keyed by their filenames. Each article must have been added to
+        self.manifest.
+        """
+        with self.render_cache_lock:
+            if self.render_cache is None:
+                self.open_render_cache()
+
+            cached = {}
+            now = time.time()
+
+            for article in articles:
+                fingerprint = self.manifest[self.article_filename(article)][
+                    "fingerprint"
+                ]
+                row = self.render_cache.execute(
+                    "SELECT html FROM renders WHERE fingerprint = ?", (fingerprint,)
+                ).fetchone()
+                if row is None:
+                    self.metrics["render_cache"]["misses"] += 1
+                    continue
+                self.render_cache.execute(
+                    "UPDATE renders SET used = ? WHERE fingerprint = ?",
+                    (now, fingerprint),
+                )
+                cached[article["file"]] = zlib.decompress(row[0]).decode("utf-8")
+                self.metrics["render_cache"]["hits"] += 1
+
+        return cached
+
+    def cache_render(self, article, html):
+        "Saves an article's rendered HTML in the render cache."
+        data = zlib.compress(html.encode("utf-8"))
+
+        with self.render_cache_lock:
+            if self.render_cache is None:
+                self.open_render_cache()
+
+            self.render_cache.execute(
+                "INSERT OR REPLACE INTO renders (fingerprint, html, size, used) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    self.manifest[self.article_filename(article)]["fingerprint"],
+                    data,
+                    len(data),
+                    time.time(),
+                ),
+            )
+
+    def trim_render_cache(self):
+        """
+        Removes HTML from the render cache that hasn't been used for KEEP_DAYS
+        days, as we can't keep the API's content any longer than the issues
+        it's in. Then removes the least recently used HTML until it's no bigger
+        than self.render_cache_size megabytes.
+        """
+        with self.render_cache_lock:
+            self._trim_render_cache()
+
+    def _trim_render_cache(self):
+        "Does the work for trim_render_cache()."
+        removed = self.render_cache.execute(
+            "DELETE FROM renders WHERE used < ?",
+            (time.time() - KEEP_DAYS * 24 * 60 * 60,),
+        ).rowcount
+
+        max_size = self.render_cache_size * 1024 * 1024
+        total_size = self.render_cache.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM renders"
+        ).fetchone()[0]
+
+        if total_size > max_size:
+            rows = self.render_cache.execute(
+                "SELECT fingerprint, size FROM renders ORDER BY used"
+            ).fetchall()
+        else:
+            rows = []
+        for fingerprint, size in rows:
+            if total_size <= max_size:
+                break
+            self.render_cache.execute(
+                "DELETE FROM renders WHERE fingerprint = ?", (fingerprint,)
+            )
+            total_size -= size
+            removed += 1
+
+        self.render_cache.commit()
+        if removed:
+            self.message("Removed %s articles from the render cache." % removed)
+
+    @contextlib.contextmanager
+    def timed(self, stage):
+        """
+        Context manager that adds the wall-clock and CPU time spent within it
+        to the stage's total in self.metrics.
+        The CPU time is only that of the current thread.
+        """
+        started = time.perf_counter()
+        started_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add_timing(
+                stage, time.perf_counter() - started, time.thread_time() - started_cpu
+            )
+
+    def add_timing(self, stage, wall, cpu):
+        "Adds one lot of wall-clock and CPU seconds to a stage in self.metrics."
+        with self.metrics_lock:
+            timing = self.metrics["stages"].setdefault(
+                stage, {"count": 0, "wall": 0.0, "cpu": 0.0}
+            )
+            timing["count"] += 1
+            timing["wall"] += wall
+            timing["cpu"] += cpu
+
+    def write_metrics(self):
+        """
+        Saves self.metrics, and a log of this run's API requests, to
+        metrics.json, if self.metrics_file is True.
+        Also saves them to self.prometheus_textfile, and the slowest articles'
+        profiles to self.profile_dir, if we have them.
+        """
+        articles = sorted(
+            self.metrics["articles"], key=lambda k: k["wall"], reverse=True
+        )
+
+        if self.verbose and articles:
+            self.message("Slowest articles to render:")
+            for article in articles[:5]:
+                self.message("  %.3fs %s" % (article["wall"], article["id"]))
+
+        if self.metrics_file:
+            self.write_file(
+                "metrics.json",
+                json.dumps(
+                    {
+                        "issue": self.issue_date.strftime("%Y-%m-%d"),
+                        "finished": datetime.datetime.now(
+                            datetime.timezone.utc
+                        ).isoformat(),
+                        "counts": self.counts,
+                        "stages": self.metrics["stages"],
+                        "requests": self.request_log,
+                        "render_cache": self.metrics["render_cache"],
+                        "articles": articles,
+                    },
+                    indent=1,
+                ),
+            )
+
+        if self.prometheus_textfile:
+            self.write_prometheus_textfile()
+
+        if self.profiles:
+            self.write_profiles()
+
+    def write_prometheus_textfile(self):
+        "Saves the main figures from self.metrics to self.prometheus_textfile."
+        api_requests = [r for r in self.request_log if r["url"] == self.api_url]
+        lines = [
+            "# HELP dailypaper_stage_seconds Wall-clock seconds spent in each stage "
+            "of the last run.",
+            "# TYPE dailypaper_stage_seconds gauge",
+        ]
+        for stage, timing in sorted(self.metrics["stages"].items()):
+            lines.append(
+                'dailypaper_stage_seconds{stage="%s"} %f' % (stage, timing["wall"])
+            )
+        lines += [
+            "# HELP dailypaper_stage_cpu_seconds CPU seconds spent in each stage of "
+            "the last run.",
+            "# TYPE dailypaper_stage_cpu_seconds gauge",
+        ]
+        for stage, timing in sorted(self.metrics["stages"].items()):
+            lines.append(
+                'dailypaper_stage_cpu_seconds{stage="%s"} %f' % (stage, timing["cpu"])
+            )
+        lines += [
+            "# HELP dailypaper_articles Articles in the last run, by what happened to "
+            "them.",
+            "# TYPE dailypaper_articles gauge",
+        ]
+        for state, count in sorted(self.counts.items()):
+            lines.append('dailypaper_articles{state="%s"} %d' % (state, count))
+        lines += [
+            "# HELP dailypaper_api_requests Requests made to the API in the last run.",
+            "# TYPE dailypaper_api_requests gauge",
+            "dailypaper_api_requests %d" % len(api_requests),
+            "# HELP dailypaper_api_bytes Bytes received from the API in the last run.",
+            "# TYPE dailypaper_api_bytes gauge",
+            "dailypaper_api_bytes %d" % sum(r["bytes"] for r in api_requests),
+            "# HELP dailypaper_last_run_timestamp_seconds When the last run finished.",
+            "# TYPE dailypaper_last_run_timestamp_seconds gauge",
+            "dailypaper_last_run_timestamp_seconds %d" % time.time(),
+        ]
 
         try:
-            article_file = open(self.issue_archive_dir + filename, "w")
+            replace_file(
+                self.prometheus_textfile, ("\n".join(lines) + "\n").encode("utf-8")
+            )
+        except EnvironmentError:
+            raise ScraperError("Unable to write the file " + self.prometheus_textfile)
+
+    def write_profiles(self):
+        """
+        Saves the profiles in self.profiles to self.profile_dir, named after
+        the issue date and article filename, eg 2023-02-25-0a1b2c.prof.
+        They can be read with Python's pstats module.
+        """
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+        except OSError:
+            raise ScraperError("Unable to make directory " + self.profile_dir)
+
+        for seconds, filename, profiler in sorted(self.profiles, reverse=True):
+            path = os.path.join(
+                self.profile_dir,
+                "%s-%s.prof"
+                % (self.issue_date.strftime("%Y-%m-%d"), filename.rsplit(".", 1)[0]),
+            )
+            profiler.dump_stats(path)
+            self.message(
+                "Saved profile of %s (%.3fs) to %s" % (filename, seconds, path)
+            )
+
+    def article_fingerprint(self, article):
+        """
+        Returns a hash of all of an article's data, as used to render it, and
+        the version of the template it would be rendered with.
+        """
+        data = json.dumps(article, sort_keys=True) + self.template_version
+        return hashlib.md5(data.encode("utf-8")).hexdigest()
+
+    def write_file(self, filename, content):
+        """
+        Saves the string content to filename within self.output_dir, as UTF-8.
+        If the file already has exactly that content it's left alone.
+        If self.precompress is True, compressed copies are saved alongside it.
+        Otherwise, if the file is changed, any old compressed copies are deleted.
+        """
+        with self.timed("write"):
+            self._write_file(filename, content)
+
+    def _write_file(self, filename, content):
+        "Does the work for write_file()."
+        path = self.output_dir + filename
+        data = content.encode("utf-8")
+
+        try:
+            try:
+                with open(path, "rb") as fp:
+                    unchanged = fp.read() == data
+            except FileNotFoundError:
+                unchanged = False
+
+            if not unchanged:
+                replace_file(path, data)
+
+            if self.precompress:
+                self.write_compressed_files(path, data)
+            elif not unchanged:
+                remove_compressed_files(path)
+        except EnvironmentError:
+            raise ScraperError("Unable to write the file " + path)
+
+    def write_file_chunks(self, filename, chunks):
+        """
+        Like write_file(), but content is an iterable of strings, which are
+        written one at a time rather than all being held in memory at once.
+        """
+        with self.timed("write"):
+            path = self.output_dir + filename
+            temp_path = temp_file_path(path)
+
             try:
-                article_file.write(html)
+                with open(temp_path, "wb") as fp:
+                    for chunk in chunks:
+                        fp.write(chunk.encode("utf-8"))
+
+                unchanged = os.path.exists(path) and filecmp.cmp(
+                    path, temp_path, shallow=False
+                )
+                if unchanged:
+                    os.remove(temp_path)
+                else:
+                    os.replace(temp_path, path)
+
+                if self.precompress:
+                    self.write_compressed_files(path)
+                elif not unchanged:
+                    remove_compressed_files(path)
+            except EnvironmentError:
+                raise ScraperError("Unable to write the file " + path)
             finally:
-                article_file.close()
-        except IOError:
-            raise ScraperError(
-                "IOError when writing " + self.issue_archive_dir + filename
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def write_compressed_files(self, path, data=None):
+        """
+        Saves gzipped and, if possible, brotli-compressed copies of the bytes
+        data at path + '.gz' and path + '.br'. If data is None, the file at
+        path is compressed a piece at a time instead.
+        Copies that are already newer than the file at path are left alone.
+        """
+        compressors = [(".gz", self.gzip_compress)]
+        if brotli is not None:
+            compressors.append(
+                (".br", lambda d: brotli.compress(d, quality=self.brotli_level))
             )
 
-        return filename
+        mtime = os.path.getmtime(path)
+
+        # A .br copy from when brotli was installed would now be out of date.
+        if (
+            brotli is None
+            and os.path.exists(path + ".br")
+            and os.path.getmtime(path + ".br") < mtime
+        ):
+            remove_compressed_files(path, [".br"])
+
+        for extension, compress in compressors:
+            compressed_path = path + extension
+            if (
+                os.path.exists(compressed_path)
+                and os.path.getmtime(compressed_path) >= mtime
+            ):
+                continue
+            if data is None:
+                self.compress_file(path, compressed_path)
+            else:
+                replace_file(compressed_path, compress(data))
+
+    def compress_file(self, path, compressed_path):
+        """
+        Saves a gzipped or brotli-compressed copy of the file at path, depending
+        on whether compressed_path ends in '.gz' or '.br', a piece at a time.
+        """
+        temp_path = temp_file_path(compressed_path)
+
+        try:
+            with open(path, "rb") as source, open(temp_path, "wb") as destination:
+                if compressed_path.endswith(".gz"):
+                    with gzip.GzipFile(
+                        filename="",
+                        fileobj=destination,
+                        mode="wb",
+                        compresslevel=self.gzip_level,
+                        mtime=0,
+                    ) as fp:
+                        shutil.copyfileobj(source, fp)
+                else:
+                    compressor = brotli.Compressor(quality=self.brotli_level)
+                    for block in iter(lambda: source.read(1024 * 1024), b""):
+                        destination.write(compressor.process(block))
+                    destination.write(compressor.finish())
+            os.replace(temp_path, compressed_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def gzip_compress(self, data):
+        """
+        Returns the gzipped bytes data. The timestamp in the gzip header is
+        left empty so that the same data always gives the same result.
+        """
+        buffer = io.BytesIO()
+        with gzip.GzipFile(
+            fileobj=buffer, mode="wb", compresslevel=self.gzip_level, mtime=0
+        ) as fp:
+            fp.write(data)
+        return buffer.getvalue()
 
     def make_article_html(self, article):
         """
         Takes the dictionary for an article from the API and returns an HTML
         version of it.
         """
-        return self.template.render(article=article)
+        return render_timed(self.template, article)[0]
 
         # TODO: Add colours.
         # if 'sectionId' in content and content['sectionId'] in self.section_ids:
@@ -638,23 +3811,26 @@ class GuardianGrabber:
         # html = "<div class=\"section-default\">\n"
 
     def fetch_page(self, url):
-        "Used for fetching all the remote pages."
+        """Used for fetching all the remote pages.
+        Returns the page's text, or None if there was an error.
+        """
 
-        self.message("Fetching: " + url)
+        import requests
 
-        try:
-            response = requests.get(url, timeout=10)
-        except requests.exceptions.ConnectionError:
-            self.message("Can't connect to domain.")
-        except requests.exceptions.ConnectTimeout:
-            self.message("Connection timed out.")
-        except requests.exceptions.ReadTimeout:
-            self.message("Read timed out.")
+        self.message("Fetching: " + url)
 
         try:
+            response = self.request(url, timeout=10)
             response.raise_for_status()
         except requests.exceptions.HTTPError:
             self.message("HTTP Error: %s" % response.status_code)
+            return None
+        except requests.exceptions.ConnectionError:
+            self.message("Can't connect to domain.")
+            return None
+        except requests.exceptions.Timeout:
+            self.message("Timed out.")
+            return None
 
         return response.text
 
@@ -668,10 +3844,108 @@ class ScraperError(Exception):
     pass
 
 
-def main():
-    scraper = GuardianGrabber()
+def parse_issue_dates(values):
+    """
+    Given a list of strings like '2023-02-25', or ranges like
+    '2023-02-24:2023-02-25', returns a sorted list of the datetimes of all of
+    those days, without duplicates.
+    Raises ValueError if any aren't valid, including ranges that end before
+    they start.
+    """
+    issue_dates = set()
+
+    for value in values:
+        first, _, last = value.partition(":")
+        first_date = datetime.datetime.strptime(first, "%Y-%m-%d")
+        last_date = datetime.datetime.strptime(last or first, "%Y-%m-%d")
+        if last_date < first_date:
+            raise ValueError("%s ends before it starts" % value)
+        while first_date <= last_date:
+            issue_dates.add(first_date)
+            first_date += datetime.timedelta(1)
 
-    scraper.start()
+    if not issue_dates:
+        raise ValueError("No issue dates")
+
+    return sorted(issue_dates)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fetches today's Guardian or Observer and saves it locally."
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running, re-fetching the issue whenever it might have changed.",
+    )
+    parser.add_argument(
+        "--rerender",
+        nargs="?",
+        const="today",
+        metavar="YYYY-MM-DD",
+        help="Rebuild today's, or another day's, issue from the API data saved "
+        "with save_raw, without using the API.",
+    )
+    parser.add_argument(
+        "--issues",
+        nargs="+",
+        metavar="YYYY-MM-DD",
+        help="Build these issues at the same time, eg after an outage. Ranges "
+        "like 2023-02-24:2023-02-25 can be used too.",
+    )
+    parser.add_argument(
+        "--async",
+        action="store_true",
+        dest="use_async",
+        help="Overlap fetching, rendering and saving pages of articles, using "
+        "asyncio.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile rendering each article, and save the slowest articles' "
+        "profiles in profile_dir.",
+    )
+    parser.add_argument(
+        "--compile-templates",
+        action="store_true",
+        help="Compile the article template to Python modules in "
+        "compiled_templates_dir, delete those compiled before, and exit. "
+        "Otherwise it's done by the first run after the template changes.",
+    )
+    args = parser.parse_args()
+
+    scraper = GuardianGrabber(profile=args.profile, use_async=args.use_async)
+
+    try:
+        if args.compile_templates:
+            compiled_dir = compile_templates(scraper.compiled_templates_dir)[0]
+            remove_old_compiled_templates(scraper.compiled_templates_dir, compiled_dir)
+            scraper.message("Compiled templates in %s" % compiled_dir)
+        elif args.daemon:
+            scraper.run_daemon()
+        elif args.issues:
+            try:
+                issue_dates = parse_issue_dates(args.issues)
+            except ValueError:
+                parser.error(
+                    "--issues dates should be like 2023-02-25, and ranges like "
+                    "2023-02-24:2023-02-25, earliest first"
+                )
+            scraper.build_issues(issue_dates)
+        elif args.rerender == "today":
+            scraper.rerender()
+        elif args.rerender:
+            try:
+                issue_date = datetime.datetime.strptime(args.rerender, "%Y-%m-%d")
+            except ValueError:
+                parser.error("--rerender dates should be like 2023-02-25")
+            scraper.rerender(issue_date)
+        else:
+            scraper.start()
+    finally:
+        scraper.close()
 
 
 if __name__ == "__main__":